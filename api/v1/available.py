@@ -1,4 +1,4 @@
-from flask import request
+from flask import request, Response
 
 from tools import api_tools
 
@@ -32,10 +32,17 @@ class API(api_tools.APIBase):
             sections = [s.strip() for s in section_filter.split(',')]
         as_schema = bool(request.args.get('as_schema', 0, type=int))
 
+        if as_schema:
+            registry = self.module.settings_schemas
+            etag = registry.etag
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = Response(registry.serialized(sections), status=200, mimetype='application/json')
+            response.set_etag(etag)
+            return response
+
         result = []
         for s in sections:
-            if not as_schema:
-                result.extend(self.module.list_integrations_by_section(s))
-            else:
-                result.extend(self.module.list_integrations_settings_by_section(s))
+            result.extend(self.module.list_integrations_by_section(s))
         return result, 200
@@ -0,0 +1,45 @@
+from flask import request
+
+from tools import auth, api_tools
+
+
+def _check(module, integrations: list):
+    payload = request.get_json(silent=True) or {}
+    if uids := payload.get('uids'):
+        uids = set(uids)
+        integrations = [i for i in integrations if i.uid in uids]
+    return module.connection_checker.check(
+        integrations, module.integrations, use_cache=not payload.get('force')
+    )
+
+
+class ProjectAPI(api_tools.APIModeHandler):
+    @auth.decorators.check_api([
+        "configuration.integrations.integrations.create",
+        "configuration.integrations.integrations.edit"
+    ])
+    def post(self, project_id: int, **kwargs):
+        integrations = self.module.get_all_integrations(project_id, group_by_section=False)
+        return _check(self.module, integrations), 200
+
+
+class AdminAPI(api_tools.APIModeHandler):
+    @auth.decorators.check_api([
+        "configuration.integrations.integrations.create",
+        "configuration.integrations.integrations.edit"
+    ])
+    def post(self, **kwargs):
+        integrations = self.module.get_administration_integrations(group_by_section=False)
+        return _check(self.module, integrations), 200
+
+
+class API(api_tools.APIBase):
+    url_params = [
+        '<int:project_id>',
+        '<string:mode>/<int:project_id>',
+    ]
+
+    mode_handlers = {
+        'default': ProjectAPI,
+        'administration': AdminAPI,
+    }
@@ -4,8 +4,9 @@ from flask import request
 from pydantic.v1 import ValidationError
 
 from tools import api_tools, auth, db, serialize, store_secrets, store_secrets_replaced
-from ...models.integration import IntegrationProject, IntegrationAdmin
+from ...models.integration import IntegrationProject, IntegrationAdmin, IntegrationUidDirectory
 from ...models.pd.integration import IntegrationPD
+from ...utils.settings_memo import parse_settings
 
 
 class ProjectAPI(api_tools.APIModeHandler):
@@ -62,6 +63,7 @@ class ProjectAPI(api_tools.APIModeHandler):
         with db.with_project_schema_session(project_id) as tenant_session:
             settings = settings.dict()
             store_secrets(settings, project_id=project_id)
+            self.module.invalidate_secrets_cache(project_id)
             db_integration = IntegrationProject(
                 name=integration_name,
                 project_id=project_id,
@@ -122,10 +124,9 @@ class ProjectAPI(api_tools.APIModeHandler):
                 # db_integration.make_default(tenant_session)
 
             settings = settings.dict()
-            settings_before = integration.settings_model.parse_obj(
-                db_integration.settings
-            ).dict()
+            settings_before = parse_settings(integration, db_integration.settings)
             store_secrets_replaced(settings, settings_before, project_id=project_id)
+            self.module.invalidate_secrets_cache(project_id)
 
             new_settings = serialize(settings)
             old_settings = db_integration.settings
@@ -212,6 +213,7 @@ class ProjectAPI(api_tools.APIModeHandler):
                 #
                 tenant_session.delete(db_integration)
                 tenant_session.commit()
+                IntegrationUidDirectory.unregister(db_integration.uid)
                 self.module.delete_default_integration(db_integration, project_id)
                 self.module.context.event_manager.fire_event(
                     "integration_settings_changed",
@@ -262,6 +264,7 @@ class AdminAPI(api_tools.APIModeHandler):
 
         settings = settings.dict()
         store_secrets(settings, project_id=None)
+        self.module.invalidate_secrets_cache()
         db_integration = IntegrationAdmin(
             name=integration_name,
             # project_id=request.json.get('project_id'),
@@ -276,6 +279,7 @@ class AdminAPI(api_tools.APIModeHandler):
             db_integration.insert(session)
             if request.json.get('is_default'):
                 db_integration.make_default(session)
+            self.module.invalidate_shared_integrations()
             #
             integration_data = serialize(IntegrationPD.from_orm(db_integration))
             #
@@ -312,10 +316,9 @@ class AdminAPI(api_tools.APIModeHandler):
                 return e.errors(), 400
 
             settings = settings.dict()
-            settings_before = integration.settings_model.parse_obj(
-                db_integration.settings
-            ).dict()
+            settings_before = parse_settings(integration, db_integration.settings)
             store_secrets_replaced(settings, settings_before, project_id=None)
+            self.module.invalidate_secrets_cache()
 
             old_settings = db_integration.settings
             new_settings = serialize(settings)
@@ -328,22 +331,13 @@ class AdminAPI(api_tools.APIModeHandler):
             if request.json.get('is_default'):
                 db_integration.make_default(session=session)
             session.commit()
+            self.module.invalidate_shared_integrations()
 
             if was_shared:
                 # was shared, but now is not == treat as deletion
                 if not db_integration.config.get('is_shared'):
                     new_settings = {}
-                projects = self.module.context.rpc_manager.call.project_list(filter_={'create_success': True})
-                project_ids = [p['id'] for p in projects]
-                self.module.context.event_manager.fire_event(
-                    "integration_settings_changed",
-                    {
-                        "project_ids": project_ids,
-                        "integration_uid": db_integration.uid,
-                        "old_settings": old_settings,
-                        "new_settings": new_settings
-                    }
-                )
+                self.module.settings_changed_fanout.dispatch(db_integration.uid, old_settings, new_settings)
 
             integration_name = db_integration.name
             integration_data = serialize(IntegrationPD.from_orm(db_integration))
@@ -376,6 +370,7 @@ class AdminAPI(api_tools.APIModeHandler):
                 return {'error': 'integration not found'}, 404
             db_integration.make_default(session=session)
             session.commit()
+            self.module.invalidate_shared_integrations()
             return {'msg': 'integration set as default'}, 200
 
     @auth.decorators.check_api({
@@ -404,19 +399,11 @@ class AdminAPI(api_tools.APIModeHandler):
             #
             session.delete(db_integration)
             session.commit()
+            self.module.invalidate_shared_integrations()
+            IntegrationUidDirectory.unregister(db_integration.uid)
 
             if db_integration.config.get('is_shared'):
-                projects = self.module.context.rpc_manager.call.project_list(filter_={'create_success': True})
-                project_ids = [p['id'] for p in projects]
-                self.module.context.event_manager.fire_event(
-                    "integration_settings_changed",
-                    {
-                        "project_ids": project_ids,
-                        "integration_uid": db_integration.uid,
-                        "old_settings": db_integration.settings,
-                        "new_settings": {}
-                    }
-                )
+                self.module.settings_changed_fanout.dispatch(db_integration.uid, db_integration.settings, {})
             return db_integration.id, 204
 
 
@@ -1,5 +1,3 @@
-from sqlalchemy import Boolean
-
 from ..models.integration import IntegrationAdmin, IntegrationDefault
 
 from tools import rpc_tools, VaultClient, db, SecretString
@@ -17,11 +15,14 @@ def _usecret_field(integration_db, project_id):
 class Event:
     @web.event('project_created')
     def create_default_s3_for_new_project(self, context, event, project: dict, **kwargs) -> None:
+        if 's3_integration' in self.lazy_default_names:
+            # inherited from the shared default at read time, see lazy_default_names
+            return
         log.info('Creating default integration for project %s', project)
         project_id = project['id']
         if integration_db := IntegrationAdmin.query.filter(
                 IntegrationAdmin.name == 's3_integration',
-                IntegrationAdmin.config['is_shared'].astext.cast(Boolean) == True,
+                IntegrationAdmin.is_shared == True,
                 IntegrationAdmin.is_default == True,
         ).one_or_none():
             with db.with_project_schema_session(project_id) as tenant_session:
@@ -34,3 +35,42 @@ class Event:
                 )
                 tenant_session.add(default_integration)
                 tenant_session.commit()
+
+    @web.event('project_created')
+    def migrate_schema_of_new_project(self, context, event, project: dict, **kwargs) -> None:
+        try:
+            self.tenant_migrations.migrate(project['id'])
+        except Exception as e:
+            log.error('Cannot migrate integration tables of project %s: %s', project['id'], e)
+
+    @web.event('integration_created')
+    def invalidate_on_integration_created(self, context, event, payload: dict) -> None:
+        self.invalidate_project_caches(payload.get('project_id'))
+        self.invalidate_secrets_cache(payload.get('project_id'))
+        self.missing_uid_cache.clear()
+
+    @web.event('integration_updated')
+    def invalidate_on_integration_updated(self, context, event, payload: dict) -> None:
+        self.invalidate_project_caches(payload.get('project_id'))
+        self.invalidate_secrets_cache(payload.get('project_id'))
+
+    @web.event('integration_deleted')
+    def invalidate_on_integration_deleted(self, context, event, payload: dict) -> None:
+        self.invalidate_project_caches(payload.get('project_id'))
+        self.invalidate_secrets_cache(payload.get('project_id'))
+
+    @web.event('integration_default_changed')
+    def invalidate_on_integration_default_changed(self, context, event, payload: dict) -> None:
+        self.invalidate_project_caches(payload.get('project_id'))
+
+    @web.event('integration_settings_changed')
+    def invalidate_on_integration_settings_changed(self, context, event, payload: dict) -> None:
+        project_ids = payload.get('project_ids') or []
+        if len(project_ids) > len(self.all_integrations_cache):
+            # shared integration changed - cheaper to drop everything
+            self.invalidate_project_caches()
+            self.invalidate_secrets_cache()
+            return
+        for project_id in project_ids:
+            self.invalidate_project_caches(project_id)
+            self.invalidate_secrets_cache(project_id)
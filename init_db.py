@@ -4,6 +4,9 @@ from tools import db
 
 
 def init_db():
-    from .models.integration import IntegrationAdmin, IntegrationProject
+    from .models.integration import IntegrationAdmin, IntegrationProject, IntegrationUidDirectory, \
+        IntegrationSchemaMigration, IntegrationSharedVersion
     db.get_shared_metadata().create_all(bind=db.engine)
+    from .utils.migrations import migrate_shared_schema
+    migrate_shared_schema()
 
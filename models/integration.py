@@ -1,6 +1,8 @@
+from typing import Dict, List, Optional
+
 from pylon.core.tools import log
-from sqlalchemy import Integer, Column, String, Boolean, UniqueConstraint, Index
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy import Integer, Column, String, Boolean, DateTime, UniqueConstraint, Index, func
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
 from uuid import uuid4
 
 from tools import db_tools, db, rpc_tools
@@ -16,18 +18,29 @@ class IntegrationAdmin(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixin,
             unique=True,
             postgresql_where=Column('is_default')  # The condition
         ),
+        Index(
+            'ix_integration_settings_gin',
+            'settings',
+            postgresql_using='gin',
+            postgresql_ops={'settings': 'jsonb_path_ops'}
+        ),
+        Index(
+            'ix_integration_shared',
+            'name',
+            postgresql_where=Column('is_shared')
+        ),
     )
     id = Column(Integer, primary_key=True)
     name = Column(String(64), unique=False)
-    settings = Column(JSON, unique=False, default={})
+    settings = Column(JSONB, unique=False, default={})
     is_default = Column(Boolean, default=False, nullable=False)
     section = Column(String(64), unique=False, nullable=False)
-    config = Column(JSON, unique=False, default={})
+    config = Column(JSONB, unique=False, default={})
     task_id = Column(String(256), unique=False, nullable=True)
     status = Column(String(256), unique=False, nullable=False, default='success')
-    # ALTER TABLE "Project-1"."integration" ADD COLUMN uid VARCHAR(128)
-    # ALTER TABLE "Project-1"."integration" ALTER COLUMN uid NOT NULL
     uid = Column(String(128), unique=True, nullable=False)
+    # mirrors config['is_shared'], kept in sync by insert()
+    is_shared = Column(Boolean, default=False, nullable=False, server_default='false')
 
     def make_default(self, session):
         session.query(IntegrationAdmin).where(
@@ -49,6 +62,7 @@ class IntegrationAdmin(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixin,
     def insert(self, session):
         if not self.uid:
             self.uid = str(uuid4())
+        self.is_shared = bool((self.config or {}).get('is_shared'))
         if not session.query(IntegrationAdmin).filter(
                 IntegrationAdmin.name == self.name,
                 IntegrationAdmin.is_default == True,
@@ -57,24 +71,34 @@ class IntegrationAdmin(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixin,
         session.add(self)
         session.commit()
         session.refresh(self)
+        IntegrationUidDirectory.register(self.uid, None, mode='administration')
         self.event_manager.fire_event(f'{self.name}_created_or_updated', self.to_json())
 
 
 class IntegrationProject(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixin, rpc_tools.EventManagerMixin):
     __tablename__ = "integration"
-    __table_args__ = {'schema': 'tenant'}
+    __table_args__ = (
+        Index(
+            'ix_integration_settings_gin',
+            'settings',
+            postgresql_using='gin',
+            postgresql_ops={'settings': 'jsonb_path_ops'}
+        ),
+        Index('ix_integration_project_id', 'project_id'),
+        Index('ix_integration_name', 'name'),
+        Index('ix_integration_section', 'section'),
+        {'schema': 'tenant'}
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(64), unique=False)
     project_id = Column(Integer, unique=False, nullable=True)
-    settings = Column(JSON, unique=False, default={})
+    settings = Column(JSONB, unique=False, default={})
     is_default = Column(Boolean, default=False, nullable=False)
     section = Column(String(64), unique=False, nullable=False)
-    config = Column(JSON, unique=False, default={})
+    config = Column(JSONB, unique=False, default={})
     task_id = Column(String(256), unique=False, nullable=True)
     status = Column(String(256), unique=False, nullable=False, default='success')
-    # ALTER TABLE "Project-1"."integration" ADD COLUMN uid VARCHAR(128)
-    # ALTER TABLE "Project-1"."integration" ALTER COLUMN uid NOT NULL
     uid = Column(String(128), unique=True, nullable=False)
 
     def insert(self, session):
@@ -82,9 +106,11 @@ class IntegrationProject(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixin
             self.uid = str(uuid4())
         session.add(self)
         session.commit()
+        if self.project_id:
+            IntegrationUidDirectory.register(self.uid, self.project_id)
         inherited_integration = IntegrationAdmin.query.filter(
             IntegrationAdmin.name == self.name,
-            IntegrationAdmin.config['is_shared'].astext.cast(Boolean) == True,
+            IntegrationAdmin.is_shared == True,
         ).first()
         default_integration = session.query(IntegrationDefault).filter(
             IntegrationDefault.name == self.name,
@@ -104,6 +130,10 @@ class IntegrationDefault(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixin
             unique=True,
             postgresql_where=Column('is_default')  # The condition
         ),
+        Index('ix_integration_default_integration_id', 'integration_id'),
+        Index('ix_integration_default_project_id', 'project_id'),
+        Index('ix_integration_default_name', 'name'),
+        Index('ix_integration_default_section', 'section'),
         {'schema': 'tenant'}
     )
 
@@ -113,3 +143,111 @@ class IntegrationDefault(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixin
     project_id = Column(Integer, unique=False, nullable=True)
     is_default = Column(Boolean, default=False, nullable=False)
     section = Column(String(64), unique=False, nullable=False)
+
+
+class IntegrationUidDirectory(db.Base):
+    """ Shared uid -> owning project lookup, so uid resolution never has to scan tenant schemas """
+    __tablename__ = "integration_uid_directory"
+
+    uid = Column(String(128), primary_key=True)
+    project_id = Column(Integer, unique=False, nullable=True, index=True)
+    mode = Column(String(64), unique=False, nullable=False, default='default')
+
+    @classmethod
+    def register(cls, uid: str, project_id: Optional[int], mode: str = 'default') -> None:
+        cls.register_many([uid], project_id, mode)
+
+    @classmethod
+    def register_many(cls, uids: List[str], project_id: Optional[int], mode: str = 'default') -> None:
+        if not uids:
+            return
+        statement = pg_insert(cls).values([
+            {'uid': uid, 'project_id': project_id, 'mode': mode} for uid in uids
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=[cls.uid],
+            set_={'project_id': statement.excluded.project_id, 'mode': statement.excluded.mode}
+        )
+        try:
+            with db.get_session() as session:
+                session.execute(statement)
+                session.commit()
+        except Exception as e:
+            # directory is only a lookup shortcut, get_by_uid falls back to scanning
+            log.warning('Cannot register integration uids %s in directory: %s', uids, e)
+
+    @classmethod
+    def unregister(cls, uid: str) -> None:
+        try:
+            with db.get_session() as session:
+                session.query(cls).filter(cls.uid == uid).delete()
+                session.commit()
+        except Exception as e:
+            log.warning('Cannot remove integration uid %s from directory: %s', uid, e)
+
+    @classmethod
+    def lookup(cls, uid: str) -> Optional['IntegrationUidDirectory']:
+        with db.get_session() as session:
+            return session.query(cls).filter(cls.uid == uid).one_or_none()
+
+    @classmethod
+    def lookup_many(cls, uids: List[str]) -> List['IntegrationUidDirectory']:
+        if not uids:
+            return []
+        with db.get_session() as session:
+            return session.query(cls).filter(cls.uid.in_(uids)).all()
+
+
+class IntegrationSchemaMigration(db.Base):
+    """ Per tenant schema progress of utils.migrations.TENANT_MIGRATIONS """
+    __tablename__ = "integration_schema_migration"
+
+    project_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    error = Column(String(1024), nullable=True)
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+    @classmethod
+    def versions(cls) -> Dict[int, int]:
+        with db.get_session() as session:
+            return dict(session.query(cls.project_id, cls.version).all())
+
+    @classmethod
+    def version_of(cls, project_id: int) -> int:
+        with db.get_session() as session:
+            return session.query(cls.version).filter(cls.project_id == project_id).scalar() or 0
+
+    @classmethod
+    def save(cls, project_id: int, version: int, error: Optional[str] = None) -> None:
+        statement = pg_insert(cls).values(project_id=project_id, version=version, error=error)
+        statement = statement.on_conflict_do_update(
+            index_elements=[cls.project_id],
+            set_={'version': version, 'error': error, 'updated_at': func.now()}
+        )
+        with db.get_session() as session:
+            session.execute(statement)
+            session.commit()
+
+
+class IntegrationSharedVersion(db.Base):
+    """ Counter bumped on every administration integrations change, see utils.shared_snapshot """
+    __tablename__ = "integration_shared_version"
+
+    id = Column(Integer, primary_key=True, default=1)
+    version = Column(Integer, nullable=False, default=0)
+
+    @classmethod
+    def current(cls) -> int:
+        with db.get_session() as session:
+            return session.query(cls.version).filter(cls.id == 1).scalar() or 0
+
+    @classmethod
+    def bump(cls) -> None:
+        statement = pg_insert(cls).values(id=1, version=1)
+        statement = statement.on_conflict_do_update(
+            index_elements=[cls.id],
+            set_={'version': cls.version + 1}
+        )
+        with db.get_session() as session:
+            session.execute(statement)
+            session.commit()
@@ -1,10 +1,11 @@
-from typing import Optional, Union
+from typing import Any, Optional, Union
 from uuid import uuid4
 
 from pydantic.v1 import BaseModel, validator
 from pylon.core.tools import log
 
 from .registration import SectionRegistrationForm
+from ...utils.settings_memo import parse_settings
 
 from tools import rpc_tools, SecretString
 
@@ -26,6 +27,43 @@ class IntegrationBase(BaseModel):
 
 
 class IntegrationPD(IntegrationBase):
+    @classmethod
+    def from_db(cls, obj: Any) -> 'IntegrationPD':
+        """
+        Trusted constructor for rows read from our own tables (ORM objects or row mappings).
+        Does what the validators below do, but resolves registration and section from
+        the in-process registry instead of RPC and skips re-validation of the row itself
+        """
+        from tools import integrations_tools
+        if isinstance(obj, dict):
+            values = {k: obj.get(k) for k in cls.__fields__}
+        else:
+            values = {k: getattr(obj, k, None) for k in cls.__fields__}
+        #
+        values['uid'] = values['uid'] or str(uuid4())
+        #
+        integration = integrations_tools.integrations.get(values['name'])
+        if not integration:
+            log.info('Integration [%s] was not found', values['name'])
+            values['settings'] = dict()
+        elif integration.settings_model:
+            values['settings'] = parse_settings(integration, values['settings'])
+        #
+        section = integrations_tools.get_section(values['section'])
+        if not section:
+            log.info('Integration section [%s] was not found', values['section'])
+            section = integrations_tools.register_section(name=values['section'])
+        values['section'] = section
+        #
+        config = dict(values['config'] or {})
+        if not config.get('name'):
+            config['name'] = f'Integration #{values["id"]}'
+        values['config'] = config
+        #
+        if values['status'] is None:
+            values['status'] = 'success'
+        return cls.construct(**values)
+
     @validator('uid', pre=True, always=True)
     def set_uid(cls, value: Optional[str]):
         if not value:
@@ -41,7 +79,7 @@ class IntegrationPD(IntegrationBase):
             log.info('Integration [%s] was not found', values['name'])
             return dict()
         # return integration.settings_model.parse_obj(value).dict(exclude={'password', 'passwd'})
-        return integration.settings_model.parse_obj(value).dict()
+        return parse_settings(integration, value)
 
     @validator("section")
     def validate_section(cls, value, values):
@@ -60,7 +98,7 @@ class IntegrationPD(IntegrationBase):
 
 
 class IntegrationDefaultPD(BaseModel):
-    id: int
+    id: Optional[int]  # None for shared defaults inherited lazily, see lazy_default_names
     name: str
     integration_id: int
     project_id: Optional[int]
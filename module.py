@@ -16,6 +16,8 @@
 #   limitations under the License.
 
 """ Module """
+from concurrent.futures import ThreadPoolExecutor
+
 from pylon.core.tools import log  # pylint: disable=E0611,E0401
 from pylon.core.tools import module
 
@@ -23,6 +25,10 @@ from pylon.core.tools import module
 # from .models.pd.integration import IntegrationBase
 
 from .init_db import init_db
+from .utils.cache import LRUCache
+from .utils.schema_registry import SchemaRegistry
+from .utils.single_flight import flights
+from .utils.validation import ValidatorRegistry
 
 from tools import theme
 
@@ -36,12 +42,125 @@ class Module(module.ModuleModel):
 
         self.integrations = dict()
         self.sections = dict()
+        self.settings_schemas = SchemaRegistry()
+        self.test_create_validators = ValidatorRegistry(
+            strict=self.descriptor.config.get('test_create_validators_strict', False),
+        )
+
+        self.all_integrations_cache = LRUCache(
+            maxsize=self.descriptor.config.get('all_integrations_cache_size', 1024),
+            ttl=self.descriptor.config.get('all_integrations_cache_ttl', 300),
+        )
+        # parsed settings by (integration name, settings hash), see utils.settings_memo
+        self.settings_memo = LRUCache(
+            maxsize=self.descriptor.config.get('settings_memo_size', 4096),
+        )
+        # resolved (unsecreted) settings of get_s3_settings / get_s3_admin_settings,
+        # keyed by (project_id, integration_id, is_local) and ('administration', integration_id)
+        self.s3_settings_cache = LRUCache(
+            maxsize=self.descriptor.config.get('s3_settings_cache_size', 1024),
+            ttl=self.descriptor.config.get('s3_settings_cache_ttl', 30),
+        )
+        # VaultClient(project_id).get_all_secrets() snapshots, see utils.secrets
+        self.secrets_cache = LRUCache(
+            maxsize=self.descriptor.config.get('secrets_cache_size', 1024),
+            ttl=self.descriptor.config.get('secrets_cache_ttl', 30),
+        )
+        # project default model of ai section, see get_default_model
+        self.default_model_cache = LRUCache(
+            maxsize=self.descriptor.config.get('default_model_cache_size', 1024),
+            ttl=self.descriptor.config.get('default_model_cache_ttl', 300),
+        )
+        # integrations whose shared administration default is inherited by projects at read time
+        # instead of being written to integration_default of every new project
+        self.lazy_default_names = list(self.descriptor.config.get('lazy_default_names', []))
+        # uids which were not found in any project, see get_by_uid
+        self.missing_uid_cache = LRUCache(
+            maxsize=self.descriptor.config.get('missing_uid_cache_size', 4096),
+            ttl=self.descriptor.config.get('missing_uid_cache_ttl', 60),
+        )
+
+    def invalidate_project_caches(self, project_id: int = None):
+        """ Drop cached integration reads for project, or for all projects if project_id is None """
+        # reads in flight may predate the change, later callers must not join them
+        flights.forget()
+        if project_id is None:
+            self.all_integrations_cache.clear()
+            self.s3_settings_cache.clear()
+            self.default_model_cache.clear()
+        else:
+            project_id = int(project_id)
+            self.all_integrations_cache.pop(project_id)
+            self.default_model_cache.pop(project_id)
+            self.s3_settings_cache.discard(lambda key: key[0] == project_id)
+
+    def invalidate_shared_integrations(self):
+        """ Administration integrations changed: rebuild the snapshot here and, on version check, in other processes """
+        self.admin_integrations.invalidate()
+        self.invalidate_project_caches()
+
+    def invalidate_secrets_cache(self, project_id: int = None):
+        """ Drop cached secrets of project, or of all projects if project_id is None """
+        flights.forget()
+        if project_id is None:
+            # administration secrets are visible to projects as well
+            self.secrets_cache.clear()
+            self.s3_settings_cache.clear()
+            self.default_model_cache.clear()
+        else:
+            project_id = int(project_id)
+            self.secrets_cache.pop(project_id)
+            self.default_model_cache.pop(project_id)
+            self.s3_settings_cache.discard(lambda key: key[0] == project_id)
 
     def init(self):
         """ Init module """
         log.info('Initializing module')
         init_db()
 
+        self.validation_pool = ThreadPoolExecutor(
+            max_workers=self.descriptor.config.get('test_create_validation_workers', 16),
+            thread_name_prefix='integrations_validation'
+        )
+
+        # tenant schema probes of get_by_uid fallback scan
+        self.uid_scan_pool = ThreadPoolExecutor(
+            max_workers=max(1, self.descriptor.config.get('uid_scan_workers', 8)),
+            thread_name_prefix='integrations_uid_scan'
+        )
+
+        from .utils.connection_checks import ConnectionChecker
+        self.connection_checker = ConnectionChecker(
+            workers=self.descriptor.config.get('connection_check_workers', 8),
+            timeout=self.descriptor.config.get('connection_check_timeout', 10),
+            cache_ttl=self.descriptor.config.get('connection_check_cache_ttl', 300),
+        )
+
+        from .utils.health_probe import HealthProber
+        self.health_prober = HealthProber(
+            self,
+            interval=self.descriptor.config.get('health_probe_interval', 900),
+            jitter=self.descriptor.config.get('health_probe_jitter', 0.1),
+            workers=self.descriptor.config.get('health_probe_workers', 4),
+            timeout=self.descriptor.config.get('connection_check_timeout', 10),
+        )
+
+        from .utils.fanout import SettingsChangedFanout
+        self.settings_changed_fanout = SettingsChangedFanout(
+            self, chunk_size=self.descriptor.config.get('settings_changed_chunk_size', 500)
+        )
+
+        from .utils.shared_snapshot import AdminIntegrationsStore
+        self.admin_integrations = AdminIntegrationsStore(
+            check_interval=self.descriptor.config.get('admin_snapshot_check_interval', 5),
+            on_outdated=self.invalidate_project_caches,
+        )
+
+        from .utils.migrations import TenantMigrationRunner
+        self.tenant_migrations = TenantMigrationRunner(
+            workers=self.descriptor.config.get('tenant_migration_workers', 8)
+        )
+
         self.descriptor.init_rpcs()
         self.descriptor.init_blueprint()
         self.descriptor.init_api()
@@ -83,8 +202,27 @@ class Module(module.ModuleModel):
 
         self.descriptor.register_tool('integrations_tools', self)
 
+        if self.descriptor.config.get('health_probe_enabled', False):
+            self.health_prober.start()
+
+        if self.descriptor.config.get('tenant_migration_on_start', False):
+            self.tenant_migrations.start(
+                lambda: [p['id'] for p in self.context.rpc_manager.call.project_list()],
+                retry_delay=self.descriptor.config.get('tenant_migration_retry_delay', 30),
+            )
+
     def deinit(self):  # pylint: disable=R0201
         """ De-init module """
         log.info('De-initializing module integrations')
         self.integrations = dict()
         self.sections = dict()
+        self.settings_schemas.clear()
+        self.invalidate_project_caches()
+        self.invalidate_secrets_cache()
+        self.validation_pool.shutdown(wait=False, cancel_futures=True)
+        self.uid_scan_pool.shutdown(wait=False, cancel_futures=True)
+        self.connection_checker.shutdown()
+        self.health_prober.stop()
+        self.tenant_migrations.stop()
+        self.settings_changed_fanout.shutdown()
+        self.missing_uid_cache.clear()
@@ -1,30 +1,347 @@
+import threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
 from functools import reduce
-from queue import Empty
-from typing import Optional, List
+from typing import Dict, Iterator, Optional, List, Set, Tuple
 
 from pylon.core.tools import log
-from sqlalchemy import desc, asc, Boolean
+from sqlalchemy import desc, asc, and_, or_, cast, column, func, literal, select, tuple_, union_all, values, Integer
+from sqlalchemy.dialects.postgresql import JSONB
 from pydantic.v1 import parse_obj_as, ValidationError
 
-from ..models.integration import IntegrationProject, IntegrationAdmin, IntegrationDefault
+from ..models.integration import IntegrationProject, IntegrationAdmin, IntegrationDefault, IntegrationUidDirectory
 from ..models.pd.integration import IntegrationPD, IntegrationDefaultPD
 from ..models.pd.registration import RegistrationForm, SectionRegistrationForm
+from ..utils.default_model import parse_default_model, resolve_default_model
+from ..utils.migrations import TENANT_JSONB_VERSION
+from ..utils.pagination import encode_cursor, decode_cursor
+from ..utils.secrets import secrets_snapshot, unsecret
+from ..utils.single_flight import single_flight
+from ..utils.validation import validate_test_integrations
 
-from tools import rpc_tools, db, serialize, VaultClient, SecretString
+from tools import rpc_tools, db, serialize, SecretString
 
 from pylon.core.tools import web
 
 
+_UNSET = object()
+
+
+def _lazy_shared_defaults() -> Dict[str, IntegrationDefaultPD]:
+    """
+    Shared administration defaults of integrations listed in lazy_default_names config.
+    Projects without their own integration_default row for such integration inherit these at read time
+    :return: default pointers (project_id None, no row id) by integration name
+    """
+    from tools import integrations_tools
+    snapshot = integrations_tools.admin_integrations.get()
+    defaults = dict()
+    for name in integrations_tools.lazy_default_names:
+        shared = snapshot.by_name.get(name, ())
+        if default := next((i for i in shared if i.is_default and i.config.get('is_shared')), None):
+            defaults[name] = IntegrationDefaultPD(
+                id=None, name=name, integration_id=default.id, project_id=None, section=default.section.name
+            )
+    return defaults
+
+
+def _inherited_defaults(names_with_default: Set[str]) -> List[IntegrationDefaultPD]:
+    """ Lazy shared defaults of integrations the project has no default of its own for """
+    return [
+        default.copy() for name, default in _lazy_shared_defaults().items()
+        if name not in names_with_default
+    ]
+
+
 def _usecret_field(integration_db, project_id, is_local):
     settings = integration_db.settings
-    secret_access_key = SecretString(settings['secret_access_key'])
-    settings['secret_access_key'] = secret_access_key.unsecret(project_id=project_id)
+    settings['secret_access_key'] = unsecret(SecretString(settings['secret_access_key']), project_id)
     settings['integration_id'] = integration_db.id
     settings['is_local'] = is_local
     return settings
 
 
+def _get_project_integration_by_uid(project_id: int, integration_uid: str) -> Optional[IntegrationProject]:
+    with db.get_session(project_id) as tenant_session:
+        if integration := tenant_session.query(IntegrationProject).filter(
+                IntegrationProject.uid == integration_uid,
+        ).first():
+            integration.project_id = project_id
+            return integration
+
+
+def _get_project_integrations_by_uids(project_id: int, integration_uids: List[str]) -> List[IntegrationProject]:
+    with db.get_session(project_id) as tenant_session:
+        integrations = tenant_session.query(IntegrationProject).filter(
+            IntegrationProject.uid.in_(integration_uids),
+        ).all()
+    for integration in integrations:
+        integration.project_id = project_id
+    return integrations
+
+
+def _scan_projects_for_uid(project_ids: List[int], integration_uid: str,
+                           pool: Optional[ThreadPoolExecutor] = None, batch_size: int = 1
+                           ) -> Optional[Tuple[int, IntegrationProject]]:
+    """
+    Look for uid in tenant schemas, batch_size schemas at a time on pool.
+    Same result as probing one by one in project_ids order: the first project that has it wins,
+    probes of the rest of the batch are cancelled
+    """
+    if pool is None or batch_size <= 1:
+        for project_id in project_ids:
+            if integration := _get_project_integration_by_uid(project_id, integration_uid):
+                return project_id, integration
+        return None
+    for start in range(0, len(project_ids), batch_size):
+        batch = project_ids[start:start + batch_size]
+        futures = [pool.submit(_get_project_integration_by_uid, project_id, integration_uid) for project_id in batch]
+        try:
+            for project_id, future in zip(batch, futures):
+                if integration := future.result():
+                    return project_id, integration
+        finally:
+            for future in futures:
+                future.cancel()
+    return None
+
+
+def _query_project_integrations(project_id: int, *filters, order_by: tuple = (),
+                                with_shared_defaults: bool = False
+                                ) -> Tuple[List[IntegrationPD], Set[Tuple[str, int]]]:
+    """
+    Project integrations with is_default resolved by a join on integration_default, defaults first.
+    :param with_shared_defaults: also collect (name, integration_id) of shared integrations
+    which are default in this project
+    :return: integrations and shared default pointers
+    """
+    shared_defaults = set()
+    with db.with_project_schema_session(project_id) as tenant_session:
+        is_default = IntegrationDefault.id.isnot(None).label('is_project_default')
+        rows = tenant_session.query(IntegrationProject, is_default).outerjoin(
+            IntegrationDefault, and_(
+                IntegrationDefault.integration_id == IntegrationProject.id,
+                IntegrationDefault.project_id == IntegrationProject.project_id,
+                IntegrationDefault.name == IntegrationProject.name,
+                IntegrationDefault.is_default == True,
+            )
+        ).filter(
+            IntegrationProject.project_id == project_id,
+            *filters
+        ).order_by(
+            desc(is_default),
+            *order_by
+        ).all()
+        if with_shared_defaults:
+            defaults = tenant_session.query(
+                IntegrationDefault.name, IntegrationDefault.integration_id, IntegrationDefault.project_id
+            ).filter(
+                IntegrationDefault.is_default == True,
+            ).all()
+            shared_defaults = {
+                (name, integration_id) for name, integration_id, default_project_id in defaults
+                if default_project_id is None
+            }
+            shared_defaults.update(
+                (i.name, i.integration_id) for i in _inherited_defaults({name for name, _, _ in defaults})
+            )
+    results = [IntegrationPD.from_db(integration) for integration, _ in rows]
+    for integration, (_, default) in zip(results, rows):
+        integration.is_default = default
+    return results, shared_defaults
+
+
+def _merge_shared_integrations(results_project: List[IntegrationPD], results_admin: List[IntegrationPD],
+                               shared_defaults: Set[Tuple[str, int]]) -> List[IntegrationPD]:
+    """ Project integrations come defaults first already, keeps that order across both lists """
+    for integration in results_admin:
+        integration.is_default = (integration.name, integration.id) in shared_defaults
+    return [
+        *(i for i in results_project if i.is_default),
+        *(i for i in results_admin if i.is_default),
+        *(i for i in results_project if not i.is_default),
+        *(i for i in results_admin if not i.is_default),
+    ]
+
+
+def _query_shared_integrations(names: List[str]) -> List[IntegrationPD]:
+    """ Shared administration integrations in get_all_integrations order, from the in-memory snapshot """
+    from tools import integrations_tools
+    return integrations_tools.admin_integrations.get().all(names, only_shared=True)
+
+
+def _resolve_all_integrations(project_id: int, names: List[str], results_admin: List[IntegrationPD]
+                              ) -> List[IntegrationPD]:
+    """ get_all_integrations of project, results_admin are not modified and can be shared between projects """
+    results_project, shared_defaults = _query_project_integrations(
+        project_id,
+        IntegrationProject.name.in_(names),
+        order_by=(
+            asc(IntegrationProject.section),
+            asc(IntegrationProject.name),
+            desc(IntegrationProject.id)
+        ),
+        with_shared_defaults=True
+    )
+    return _merge_shared_integrations(results_project, [i.copy() for i in results_admin], shared_defaults)
+
+
+def _hand_out(results: List[IntegrationPD], group_by_section: bool) -> dict | List[IntegrationPD]:
+    # cached models are shared between callers, hand out copies
+    results = [i.copy(deep=True) for i in results]
+    if not group_by_section:
+        return results
+
+    def reducer(accum: dict, new_value: IntegrationPD) -> dict:
+        accum[new_value.section.name].append(new_value)
+        return accum
+
+    return reduce(reducer, results, defaultdict(list))
+
+
+def _section_sort_keys(project_id: int, section_name: str, sort_by: str, shared: List[IntegrationPD]):
+    """
+    (sort_value, origin, id) of project integrations of a section and of given shared ones as one selectable.
+    Shared integrations live in the shared schema and cannot be joined from the tenant session,
+    their keys come in as VALUES so that the database still sorts both with the same collation
+    """
+    sort_column = IntegrationProject.__table__.c[sort_by]
+    project_select = select(
+        sort_column.label('sort_value'),
+        literal(0, Integer).label('origin'),
+        IntegrationProject.id,
+    ).where(
+        IntegrationProject.project_id == project_id,
+        IntegrationProject.section == section_name,
+    )
+    if not shared:
+        return project_select.subquery('section_integrations')
+    shared_keys = values(
+        column('sort_value', sort_column.type),
+        column('origin', Integer),
+        column('id', Integer),
+        name='shared_integrations'
+    ).data([
+        (i.section.name if sort_by == 'section' else getattr(i, sort_by), 1, i.id)
+        for i in shared
+    ])
+    return union_all(project_select, select(shared_keys)).subquery('section_integrations')
+
+
+_PROJECT_BY_NAME_ORDER = (
+    asc(IntegrationProject.section),
+    desc(IntegrationProject.is_default),
+    asc(IntegrationProject.name),
+    desc(IntegrationProject.id)
+)
+_PROJECT_BY_SECTION_ORDER = (
+    desc(IntegrationProject.is_default),
+    asc(IntegrationProject.name),
+    desc(IntegrationProject.id)
+)
+
+
+SORTABLE_COLUMNS = ('id', 'name', 'section', 'status', 'uid')
+
+_JSON_TYPES = {bool: 'boolean', int: 'number', float: 'number', str: 'string'}
+
+
+def _setting_value_filter(settings, settings_model, setting_name: str, setting_value):
+    """
+    SQL prefilter on stored settings for parsed settings[setting_name] == setting_value.
+    Keeps every row whose parsed value may differ from the stored one: key missing (model default)
+    or stored as another json type (coerced by the model). Matches are confirmed on parsed settings
+    :return: None if the model may transform the value otherwise, compare parsed settings of all rows then
+    """
+    if type(setting_value) not in _JSON_TYPES:
+        return None
+    json_type_differs = func.jsonb_typeof(settings[setting_name]) != _JSON_TYPES[type(setting_value)]
+    if settings_model is None:
+        # settings are handed out as stored
+        return or_(settings.contains({setting_name: setting_value}), json_type_differs)
+    field = settings_model.__fields__.get(setting_name)
+    config = settings_model.__config__
+    if field is None or field.alias != field.name or field.class_validators \
+            or field.outer_type_ not in _JSON_TYPES \
+            or settings_model.__pre_root_validators__ or settings_model.__post_root_validators__ \
+            or config.anystr_strip_whitespace or getattr(config, 'anystr_lower', False) \
+            or getattr(config, 'anystr_upper', False):
+        return None
+    return or_(
+        settings.contains({setting_name: setting_value}),
+        ~settings.has_key(setting_name),
+        json_type_differs,
+    )
+
+
+def _resolve_s3_settings(project_id, integration_id=None, is_local=True) -> Optional[dict]:
+    integration_name = 's3_integration'
+    try:
+        if integration_id and is_local:
+            with db.with_project_schema_session(project_id) as tenant_session:
+                if integration_db := tenant_session.query(IntegrationProject).filter(
+                        IntegrationProject.id == integration_id,
+                        IntegrationProject.name == integration_name
+                ).one_or_none():
+                    return _usecret_field(integration_db, project_id, is_local=True)
+        elif integration_id:
+            if integration_db := IntegrationAdmin.query.filter(
+                    IntegrationAdmin.id == integration_id,
+                    IntegrationAdmin.name == integration_name,
+                    IntegrationAdmin.is_shared == True
+            ).one_or_none():
+                return _usecret_field(integration_db, project_id, is_local=False)
+        # in case if integration_id is not provided - try to find default integration:
+        else:
+            with db.with_project_schema_session(project_id) as tenant_session:
+                default_integration = tenant_session.query(IntegrationDefault).filter(
+                    IntegrationDefault.name == integration_name
+                ).one_or_none()
+                if default_integration and default_integration.project_id:
+                    if integration_db := tenant_session.query(IntegrationProject).filter(
+                            IntegrationProject.id == default_integration.integration_id,
+                            IntegrationProject.name == integration_name
+                    ).one_or_none():
+                        return _usecret_field(integration_db, project_id, is_local=True)
+                elif default_integration:
+                    if integration_db := IntegrationAdmin.query.filter(
+                            IntegrationAdmin.id == default_integration.integration_id,
+                            IntegrationAdmin.name == integration_name,
+                            IntegrationAdmin.is_shared == True
+                    ).one_or_none():
+                        return _usecret_field(integration_db, project_id, is_local=False)
+                elif inherited := _lazy_shared_defaults().get(integration_name):
+                    if integration_db := IntegrationAdmin.query.filter(
+                            IntegrationAdmin.id == inherited.integration_id,
+                    ).one_or_none():
+                        return _usecret_field(integration_db, project_id, is_local=False)
+    except Exception as e:
+        log.warning(f'Cannot receive S3 settings for project {project_id}')
+        log.debug(e)
+
+
+def _resolve_s3_admin_settings(integration_id=None) -> Optional[dict]:
+    integration_name = 's3_integration'
+    try:
+        if integration_id:
+            if integration_db := IntegrationAdmin.query.filter(
+                    IntegrationAdmin.id == integration_id,
+                    IntegrationAdmin.name == integration_name,
+            ).one_or_none():
+                return _usecret_field(integration_db, None, is_local=False)
+        # in case if integration_id is not provided - try to find default integration:
+        else:
+            if integration_db := IntegrationAdmin.query.filter(
+                    IntegrationAdmin.name == integration_name,
+                    IntegrationAdmin.is_default == True,
+            ).one_or_none():
+                return _usecret_field(integration_db, None, is_local=False)
+    except Exception as e:
+        log.warning(f'Cannot receive S3 settings in administration mode')
+        log.debug(e)
+
+
 class RPC:
     rpc = lambda name: web.rpc(f'integrations_{name}', name)
 
@@ -33,8 +350,31 @@ class RPC:
     def register(self, **kwargs) -> RegistrationForm:
         form_data = RegistrationForm(**kwargs)
         self.integrations[form_data.name] = form_data
+        try:
+            self.settings_schemas.register(form_data.name, form_data.section, form_data.settings_model)
+        except Exception as e:
+            # the integration works without a published schema, do not fail its registration
+            log.error('Cannot build settings schema of integration %s: %s', form_data.name, e)
+            self.settings_schemas.register(form_data.name, form_data.section, None)
+        self.settings_memo.discard(lambda key: key[0] == form_data.name)
+        self.admin_integrations.invalidate(bump=False)
+        self.invalidate_project_caches()
         return form_data
 
+    @rpc('register_test_create_validator')
+    def register_test_create_validator(self, kind: str, integration_name: str, available: bool = True) -> None:
+        """
+        Declare whether {kind}_test_create_integration_validate_{integration_name} RPC is provided
+        :param kind: security, backend_performance or ui_performance
+        :param available: False - there is no such validator, test creation does not call it.
+            After the first declaration of a kind, undeclared validators of it are not called either
+        """
+        self.test_create_validators.declare(kind, integration_name, available)
+
+    @rpc('list_test_create_validators')
+    def list_test_create_validators(self) -> dict:
+        return self.test_create_validators.declared()
+
     @rpc('get_by_name')
     def get_by_name(self, integration_name: str) -> Optional[RegistrationForm]:
         return self.integrations.get(integration_name)
@@ -51,28 +391,19 @@ class RPC:
 
     @rpc('list_integrations_settings_by_section')
     def list_integrations_settings_by_section(self, section: str = None) -> list:
-        if section:
-            return [v.settings_model.schema() for k, v in self.integrations.items() if v.section == section]
-        return [v.settings_model.schema() for k, v in self.integrations.items()]
+        return self.settings_schemas.schemas(section)
 
     @rpc('get_project_integrations')
     def get_project_integrations(self, project_id: int, group_by_section: bool = True) -> dict:
-        with db.with_project_schema_session(project_id) as tenant_session:
-            results = tenant_session.query(IntegrationProject).filter(
-                IntegrationProject.project_id == project_id,
-                IntegrationProject.name.in_(self.integrations.keys()),
-            ).group_by(
-                IntegrationProject.section,
-                IntegrationProject.id
-            ).order_by(
+        results, _ = _query_project_integrations(
+            project_id,
+            IntegrationProject.name.in_(self.integrations.keys()),
+            order_by=(
                 asc(IntegrationProject.section),
-                # desc(IntegrationProject.is_default),
                 asc(IntegrationProject.name),
                 desc(IntegrationProject.id)
-            ).all()
-
-        results = parse_obj_as(List[IntegrationPD], results)
-        results = self.process_default_integrations(project_id, results)
+            )
+        )
 
         if not group_by_section:
             return results
@@ -88,35 +419,24 @@ class RPC:
                                          ) -> List[IntegrationPD]:
         if integration_name not in self.integrations.keys():
             return []
-        with db.with_project_schema_session(project_id) as tenant_session:
-            results = tenant_session.query(IntegrationProject).filter(
-                IntegrationProject.project_id == project_id,
-                IntegrationProject.name == integration_name
-            ).order_by(
-                asc(IntegrationProject.section),
-                desc(IntegrationProject.is_default),
-                asc(IntegrationProject.name),
-                desc(IntegrationProject.id)
-            ).all()
-        results = parse_obj_as(List[IntegrationPD], results)
-        return self.process_default_integrations(project_id, results)
+        results, _ = _query_project_integrations(
+            project_id,
+            IntegrationProject.name == integration_name,
+            order_by=_PROJECT_BY_NAME_ORDER
+        )
+        return results
 
     @rpc('get_project_integrations_by_section')
     def get_project_integrations_by_section(self, project_id: Optional[int], section_name: str,
                                             ) -> List[IntegrationPD]:
         if section_name not in self.sections.keys():
             return []
-        with db.with_project_schema_session(project_id) as tenant_session:
-            results = tenant_session.query(IntegrationProject).filter(
-                IntegrationProject.project_id == project_id,
-                IntegrationProject.section == section_name
-            ).order_by(
-                desc(IntegrationProject.is_default),
-                asc(IntegrationProject.name),
-                desc(IntegrationProject.id)
-            ).all()
-        results = parse_obj_as(List[IntegrationPD], results)
-        return self.process_default_integrations(project_id, results)
+        results, _ = _query_project_integrations(
+            project_id,
+            IntegrationProject.section == section_name,
+            order_by=_PROJECT_BY_SECTION_ORDER
+        )
+        return results
 
     @rpc('register_section')
     @rpc_tools.wrap_exceptions(ValidationError)
@@ -162,6 +482,7 @@ class RPC:
         return integration
 
     @rpc('get_by_uid')
+    @single_flight
     def get_by_uid(
             self, integration_uid: str,
             project_id: Optional[int] = None,
@@ -175,14 +496,11 @@ class RPC:
         :return: integration ORM object or None
         """
         integration_uid = str(integration_uid)
+        missing_generation = self.missing_uid_cache.generation
         #
         if project_id is not None:
-            with db.get_session(project_id) as tenant_session:
-                if integration := tenant_session.query(IntegrationProject).filter(
-                        IntegrationProject.uid == integration_uid,
-                ).one_or_none():
-                    integration.project_id = project_id
-                    return integration
+            if integration := _get_project_integration_by_uid(project_id, integration_uid):
+                return integration
         #
         with db.get_session() as session:
             if integration := session.query(IntegrationAdmin).where(
@@ -190,7 +508,16 @@ class RPC:
             ).first():
                 return integration
         #
-        if check_all_projects:
+        # the directory points into other projects, it has the same scope as the scan below
+        if check_all_projects and (entry := IntegrationUidDirectory.lookup(integration_uid)):
+            if entry.project_id is not None and entry.project_id != project_id:
+                if integration := _get_project_integration_by_uid(entry.project_id, integration_uid):
+                    return integration
+            # stale entry, integration was removed bypassing the directory
+            IntegrationUidDirectory.unregister(integration_uid)
+        #
+        # the negative cache only spares the scan, integrations created since are found above
+        if check_all_projects and not self.missing_uid_cache.get(integration_uid):
             all_projects = self.context.rpc_manager.call.project_list()
             #
             # hotfix some legacy behaviour by moving project-projects to the top
@@ -206,13 +533,125 @@ class RPC:
             #
             projects.extend(personal_projects)
             #
-            for project in projects:
-                with db.get_session(project['id']) as tenant_session:
-                    if integration := tenant_session.query(IntegrationProject).where(
-                            IntegrationProject.uid == integration_uid,
-                    ).first():
-                        integration.project_id = project['id']
-                        return integration
+            if found := _scan_projects_for_uid(
+                    [project['id'] for project in projects], integration_uid,
+                    self.uid_scan_pool, self.descriptor.config.get('uid_scan_workers', 8)
+            ):
+                found_project_id, integration = found
+                IntegrationUidDirectory.register(integration_uid, found_project_id)
+                return integration
+            #
+            self.missing_uid_cache.set(integration_uid, True, generation=missing_generation)
+
+    @rpc('get_by_uids_dict')
+    def get_by_uids_dict(self, *args, **kwargs) -> Dict[str, dict]:
+        return {uid: integration.to_json() for uid, integration in self.get_by_uids(*args, **kwargs).items()}
+
+    @rpc('get_by_uids')
+    def get_by_uids(
+            self, integration_uids: List[str],
+            project_id: Optional[int] = None,
+            check_all_projects: bool = True
+    ) -> Dict[str, IntegrationProject | IntegrationAdmin]:
+        """
+        get_by_uid for many uids, with one query per schema: current project, administration,
+        and with check_all_projects: projects known from uid directory, then the rest of projects
+        :return: integration ORM objects by uid, uids that were not found are left out
+        """
+        found = dict()
+        pending = {str(uid) for uid in integration_uids}
+        missing_generation = self.missing_uid_cache.generation
+        #
+        if pending and project_id is not None:
+            for integration in _get_project_integrations_by_uids(project_id, list(pending)):
+                found[integration.uid] = integration
+            pending -= found.keys()
+        #
+        if pending:
+            with db.get_session() as session:
+                for integration in session.query(IntegrationAdmin).where(
+                        IntegrationAdmin.uid.in_(pending),
+                ).all():
+                    found[integration.uid] = integration
+            pending -= found.keys()
+        #
+        # the directory points into other projects, it has the same scope as the scan below
+        if pending and check_all_projects:
+            by_project = defaultdict(list)
+            for entry in IntegrationUidDirectory.lookup_many(list(pending)):
+                if entry.project_id is not None and entry.project_id != project_id:
+                    by_project[entry.project_id].append(entry.uid)
+                else:
+                    IntegrationUidDirectory.unregister(entry.uid)
+            for entry_project_id, uids in by_project.items():
+                for integration in _get_project_integrations_by_uids(entry_project_id, uids):
+                    found[integration.uid] = integration
+                # stale entries, integrations were removed bypassing the directory
+                for uid in set(uids) - found.keys():
+                    IntegrationUidDirectory.unregister(uid)
+            pending -= found.keys()
+        #
+        if check_all_projects:
+            # the negative cache only spares the scan, integrations created since are found above
+            pending = {uid for uid in pending if not self.missing_uid_cache.get(uid)}
+        if pending and check_all_projects:
+            all_projects = self.context.rpc_manager.call.project_list()
+            # same priority as get_by_uid: personal projects last
+            project_ids = [p['id'] for p in all_projects if not p['name'].startswith('project_user_')]
+            project_ids.extend(p['id'] for p in all_projects if p['name'].startswith('project_user_'))
+            batch_size = max(1, self.descriptor.config.get('uid_scan_workers', 8))
+            for start in range(0, len(project_ids), batch_size):
+                if not pending:
+                    break
+                batch = project_ids[start:start + batch_size]
+                uids = list(pending)
+                futures = [
+                    self.uid_scan_pool.submit(_get_project_integrations_by_uids, scan_project_id, uids)
+                    for scan_project_id in batch
+                ]
+                try:
+                    # earlier projects win, as in the one by one scan
+                    for scan_project_id, future in zip(batch, futures):
+                        hits = [i for i in future.result() if i.uid in pending]
+                        for integration in hits:
+                            found[integration.uid] = integration
+                        pending -= {i.uid for i in hits}
+                        IntegrationUidDirectory.register_many([i.uid for i in hits], scan_project_id)
+                        if not pending:
+                            break
+                finally:
+                    for future in futures:
+                        future.cancel()
+            for uid in pending:
+                self.missing_uid_cache.set(uid, True, generation=missing_generation)
+        return found
+
+    @rpc('backfill_uid_directory')
+    def backfill_uid_directory(self, project_ids: Optional[List[int]] = None) -> int:
+        """
+        One-shot fill of the uid directory from existing integrations.
+        :param project_ids: projects to index, all projects if None
+        :return: number of indexed uids
+        """
+        total = 0
+        with db.get_session() as session:
+            admin_uids = [uid for uid, in session.query(IntegrationAdmin.uid).all()]
+        IntegrationUidDirectory.register_many(admin_uids, None, mode='administration')
+        total += len(admin_uids)
+        #
+        if project_ids is None:
+            project_ids = [p['id'] for p in self.context.rpc_manager.call.project_list()]
+        for project_id in project_ids:
+            try:
+                with db.get_session(project_id) as tenant_session:
+                    uids = [uid for uid, in tenant_session.query(IntegrationProject.uid).all()]
+            except Exception as e:
+                log.warning('Cannot read integration uids of project %s: %s', project_id, e)
+                continue
+            IntegrationUidDirectory.register_many(uids, project_id)
+            total += len(uids)
+        log.info('Integration uid directory backfilled with %s uids', total)
+        return total
 
     @web.rpc('security_test_create_integrations')
     @rpc_tools.wrap_exceptions(ValidationError)
@@ -222,31 +661,7 @@ class RPC:
             skip_validation_if_undefined: bool = True,
             **kwargs
     ) -> dict:
-        integration_data = dict()
-
-        for section, integration in data.items():
-            integration_data[section] = dict()
-            for k, v in integration.items():
-                try:
-                    integration_data[section][
-                        k] = self.context.rpc_manager.call_function_with_timeout(
-                        func=f'security_test_create_integration_validate_{k}',
-                        timeout=1,
-                        data=v,
-                        **kwargs
-                    )
-                except Empty:
-                    log.warning(f'Cannot validate integration data for {k}')
-                    if skip_validation_if_undefined:
-                        integration_data[section][k] = v
-                except ValidationError as e:
-                    for i in e.errors():
-                        i['loc'] = [f'{section}_{k}', *i['loc']]
-                    raise e
-                except Exception as e:
-                    e.loc = [f'{section}_{k}', *getattr(e, 'loc', [])]
-                    raise e
-        return {'integrations': integration_data}
+        return validate_test_integrations(self, 'security', data, skip_validation_if_undefined, **kwargs)
 
     @web.rpc('backend_performance_test_create_integrations')
     @rpc_tools.wrap_exceptions(ValidationError)
@@ -256,31 +671,7 @@ class RPC:
             skip_validation_if_undefined: bool = True,
             **kwargs
     ) -> dict:
-        integration_data = dict()
-
-        for section, integration in data.items():
-            integration_data[section] = dict()
-            for k, v in integration.items():
-                try:
-                    integration_data[section][
-                        k] = self.context.rpc_manager.call_function_with_timeout(
-                        func=f'backend_performance_test_create_integration_validate_{k}',
-                        timeout=1,
-                        data=v,
-                        **kwargs
-                    )
-                except Empty:
-                    log.warning(f'Cannot validate integration data for {k}')
-                    if skip_validation_if_undefined:
-                        integration_data[section][k] = v
-                except ValidationError as e:
-                    for i in e.errors():
-                        i['loc'] = [f'{section}_{k}', *i['loc']]
-                    raise e
-                except Exception as e:
-                    e.loc = [f'{section}_{k}', *getattr(e, 'loc', [])]
-                    raise e
-        return {'integrations': integration_data}
+        return validate_test_integrations(self, 'backend_performance', data, skip_validation_if_undefined, **kwargs)
 
     @web.rpc('ui_performance_test_create_integrations')
     @rpc_tools.wrap_exceptions(ValidationError)
@@ -290,31 +681,7 @@ class RPC:
             skip_validation_if_undefined: bool = True,
             **kwargs
     ) -> dict:
-        integration_data = dict()
-
-        for section, integration in data.items():
-            integration_data[section] = dict()
-            for k, v in integration.items():
-                try:
-                    integration_data[section][
-                        k] = self.context.rpc_manager.call_function_with_timeout(
-                        func=f'ui_performance_test_create_integration_validate_{k}',
-                        timeout=1,
-                        data=v,
-                        **kwargs
-                    )
-                except Empty:
-                    log.warning(f'Cannot validate integration data for {k}')
-                    if skip_validation_if_undefined:
-                        integration_data[section][k] = v
-                except ValidationError as e:
-                    for i in e.errors():
-                        i['loc'] = [f'{section}_{k}', *i['loc']]
-                    raise e
-                except Exception as e:
-                    e.loc = [f'{section}_{k}', *getattr(e, 'loc', [])]
-                    raise e
-        return {'integrations': integration_data}
+        return validate_test_integrations(self, 'ui_performance', data, skip_validation_if_undefined, **kwargs)
 
     @rpc('get_cloud_integrations')
     def get_cloud_integrations(self, project_id: int) -> list:
@@ -322,8 +689,9 @@ class RPC:
         Gets project integrations in cloud section
         """
         integrations = self.get_project_integrations(project_id)
-        admin_integrations = self.get_administration_integrations(group_by_section=True)
-        integrations["clouds"].extend(admin_integrations["clouds"])
+        integrations["clouds"].extend(
+            i for i in self.admin_integrations.get().in_section("clouds") if i.name in self.integrations
+        )
         cloud_integrations = self.process_default_integrations(project_id, integrations["clouds"])
         cloud_regions = [
             {
@@ -354,7 +722,7 @@ class RPC:
                 desc(IntegrationAdmin.id)
             ).all()
 
-            results = parse_obj_as(List[IntegrationPD], results)
+            results = [IntegrationPD.from_db(i) for i in results]
 
             if not group_by_section:
                 return results
@@ -373,7 +741,7 @@ class RPC:
             return []
         filters = [IntegrationAdmin.name == integration_name]
         if only_shared:
-            filters.append(IntegrationAdmin.config['is_shared'].astext.cast(Boolean) == True)
+            filters.append(IntegrationAdmin.is_shared == True)
         results = IntegrationAdmin.query.filter(
             *filters
         ).order_by(
@@ -382,8 +750,7 @@ class RPC:
             asc(IntegrationAdmin.name),
             desc(IntegrationAdmin.id)
         ).all()
-        results = parse_obj_as(List[IntegrationPD], results)
-        return results
+        return [IntegrationPD.from_db(i) for i in results]
 
     @rpc('get_administration_integrations_by_section')
     def get_administration_integrations_by_section(self, section_name: str,
@@ -393,7 +760,7 @@ class RPC:
             return []
         filters = [IntegrationAdmin.section == section_name]
         if only_shared:
-            filters.append(IntegrationAdmin.config['is_shared'].astext.cast(Boolean) == True)
+            filters.append(IntegrationAdmin.is_shared == True)
         results = IntegrationAdmin.query.filter(
             *filters
         ).order_by(
@@ -401,8 +768,7 @@ class RPC:
             asc(IntegrationAdmin.name),
             desc(IntegrationAdmin.id)
         ).all()
-        results = parse_obj_as(List[IntegrationPD], results)
-        return results
+        return [IntegrationPD.from_db(i) for i in results]
 
     @rpc('process_default_integrations')
     def process_default_integrations(self, project_id, integrations):
@@ -424,67 +790,139 @@ class RPC:
         return sorted(integrations, key=lambda i: not i.is_default)
 
     @rpc('get_all_integrations')
+    @single_flight
     def get_all_integrations(self, project_id: int, group_by_section: bool = True) -> dict:
-        with db.with_project_schema_session(project_id) as tenant_session:
-            results_project = tenant_session.query(IntegrationProject).filter(
-                IntegrationProject.project_id == project_id,
-                IntegrationProject.name.in_(self.integrations.keys())
-            ).group_by(
-                IntegrationProject.section,
-                IntegrationProject.id
-            ).order_by(
-                asc(IntegrationProject.section),
-                # desc(IntegrationProject.is_default),
-                asc(IntegrationProject.name),
-                desc(IntegrationProject.id)
-            ).all()
-        results_admin = IntegrationAdmin.query.filter(
-            IntegrationAdmin.name.in_(self.integrations.keys()),
-            IntegrationAdmin.config['is_shared'].astext.cast(Boolean) == True
-        ).group_by(
-            IntegrationAdmin.section,
-            IntegrationAdmin.id
-        ).order_by(
-            asc(IntegrationAdmin.section),
-            desc(IntegrationAdmin.is_default),
-            asc(IntegrationAdmin.name),
-            desc(IntegrationAdmin.id)
-        ).all()
-        results_project = parse_obj_as(List[IntegrationPD], results_project)
-        results_admin = parse_obj_as(List[IntegrationPD], results_admin)
-        results = self.process_default_integrations(project_id, results_project + results_admin)
-        if not group_by_section:
-            return results
-
-        def reducer(accum: dict, new_value: IntegrationPD) -> dict:
-            accum[new_value.section.name].append(new_value)
-            return accum
+        cache_key = int(project_id)
+        results = self.all_integrations_cache.get(cache_key)
+        if results is None:
+            generation = self.all_integrations_cache.generation
+            names = list(self.integrations.keys())
+            results = _resolve_all_integrations(project_id, names, _query_shared_integrations(names))
+            self.all_integrations_cache.set(cache_key, results, generation=generation)
+        return _hand_out(results, group_by_section)
 
-        return reduce(reducer, results, defaultdict(list))
+    @rpc('get_all_integrations_batch')
+    def get_all_integrations_batch(self, project_ids: List[int], group_by_section: bool = True,
+                                   workers: Optional[int] = None
+                                   ) -> Iterator[Tuple[int, Optional[dict | List[IntegrationPD]]]]:
+        """
+        get_all_integrations for many projects: shared integrations are read once,
+        tenant schemas are queried on a bounded pool, chunk by chunk.
+        :param workers: parallel tenant queries, batch_read_workers from config if None
+        :return: iterator of (project_id, same as get_all_integrations) in project_ids order,
+            None instead of integrations if project could not be read
+        """
+        workers = workers or self.descriptor.config.get('batch_read_workers', 8)
+        chunk_size = max(workers, self.descriptor.config.get('batch_read_chunk_size', 64))
+        names = list(self.integrations.keys())
+        results_admin = None
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='integrations_batch') as pool:
+            for start in range(0, len(project_ids), chunk_size):
+                chunk = [int(project_id) for project_id in project_ids[start:start + chunk_size]]
+                cached = {project_id: self.all_integrations_cache.get(project_id) for project_id in chunk}
+                if results_admin is None and any(results is None for results in cached.values()):
+                    results_admin = _query_shared_integrations(names)
+                generation = self.all_integrations_cache.generation
+                futures = {
+                    project_id: pool.submit(_resolve_all_integrations, project_id, names, results_admin)
+                    for project_id, results in cached.items() if results is None
+                }
+                for project_id in chunk:
+                    if (results := cached[project_id]) is None:
+                        try:
+                            results = futures[project_id].result()
+                        except Exception as e:
+                            log.warning('Cannot read integrations of project %s: %s', project_id, e)
+                            yield project_id, None
+                            continue
+                        self.all_integrations_cache.set(project_id, results, generation=generation)
+                    yield project_id, _hand_out(results, group_by_section)
 
     @rpc('get_all_integrations_by_name')
+    @single_flight
     def get_all_integrations_by_name(self, project_id: int, integration_name: str) -> List[IntegrationPD]:
-        results_project = self.get_project_integrations_by_name(project_id, integration_name)
-        results_admin = self.get_administration_integrations_by_name(integration_name, True)
-        return self.process_default_integrations(project_id, results_project + results_admin)
+        if integration_name not in self.integrations.keys():
+            return []
+        results_project, shared_defaults = _query_project_integrations(
+            project_id,
+            IntegrationProject.name == integration_name,
+            order_by=_PROJECT_BY_NAME_ORDER,
+            with_shared_defaults=True
+        )
+        results_admin = self.admin_integrations.get().with_name(integration_name, only_shared=True)
+        return _merge_shared_integrations(results_project, results_admin, shared_defaults)
 
     @rpc('get_all_integrations_by_section')
+    @single_flight
     def get_all_integrations_by_section(self, project_id: int, section_name: str) -> List[IntegrationPD]:
-        results_project = self.get_project_integrations_by_section(project_id, section_name)
-        results_admin = self.get_administration_integrations_by_section(section_name, True)
-        return self.process_default_integrations(project_id, results_project + results_admin)
+        if section_name not in self.sections.keys():
+            return []
+        results_project, shared_defaults = _query_project_integrations(
+            project_id,
+            IntegrationProject.section == section_name,
+            order_by=_PROJECT_BY_SECTION_ORDER,
+            with_shared_defaults=True
+        )
+        results_admin = self.admin_integrations.get().in_section(section_name, only_shared=True)
+        return _merge_shared_integrations(results_project, results_admin, shared_defaults)
 
     @rpc('get_sorted_paginated_integrations_by_section')
     def get_sorted_paginated_integrations_by_section(self, section_name: str, project_id: int, sort_order: str,
-                                                     sort_by: str, offset: int, limit: int):
-        results_project = self.get_project_integrations_by_section(project_id, section_name)
-        results_admin = self.get_administration_integrations_by_section(section_name, True)
-        results = parse_obj_as(List[IntegrationPD], results_project + results_admin)
-        descending = sort_order.lower() == 'desc'
-        sorted_list = sorted(results, key=lambda x: getattr(x, sort_by), reverse=descending)
-        paginated_results = sorted_list[offset:limit]
+                                                     sort_by: str, offset: int, limit: int) -> List[IntegrationPD]:
+        results, _ = self.get_integrations_page_by_section(
+            section_name, project_id, sort_order=sort_order, sort_by=sort_by, offset=offset, limit=limit
+        )
+        return results
 
-        return paginated_results
+    @rpc('get_integrations_page_by_section')
+    def get_integrations_page_by_section(self, section_name: str, project_id: int,
+                                         sort_order: str = 'asc', sort_by: str = 'name',
+                                         limit: int = 10_000, cursor: Optional[str] = None,
+                                         offset: int = 0) -> Tuple[List[IntegrationPD], Optional[str]]:
+        """
+        Project and shared integrations of a section, sorted and paginated in the database.
+        :param sort_by: one of SORTABLE_COLUMNS
+        :param cursor: next_cursor of the previous page, offset is ignored when cursor is given
+        :return: page of integrations and cursor of the next page (None for the last page)
+        """
+        if sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f'Cannot sort integrations by {sort_by}')
+        if section_name not in self.sections.keys() or limit <= 0:
+            return [], None
+        descending = sort_order.lower() == 'desc'
+        after = decode_cursor(cursor, 3)
+        #
+        shared = self.admin_integrations.get().in_section(section_name, only_shared=True)
+        integrations = _section_sort_keys(project_id, section_name, sort_by, shared)
+        sort_key = (integrations.c.sort_value, integrations.c.origin, integrations.c.id)
+        query = select(integrations).order_by(*(desc(c) if descending else asc(c) for c in sort_key))
+        if after is not None:
+            key, bound = tuple_(*sort_key), tuple_(*(literal(v) for v in after))
+            query = query.where(key < bound if descending else key > bound)
+        elif offset:
+            query = query.offset(offset)
+        query = query.limit(limit + 1)
+        #
+        with db.with_project_schema_session(project_id) as tenant_session:
+            keys = tenant_session.execute(query).all()
+        #
+        next_cursor = None
+        if len(keys) > limit:
+            keys = keys[:limit]
+            next_cursor = encode_cursor(*keys[-1])
+        results_project, shared_defaults = _query_project_integrations(
+            project_id,
+            IntegrationProject.id.in_([id_ for _, origin, id_ in keys if origin == 0]),
+            with_shared_defaults=True
+        )
+        for integration in shared:
+            integration.is_default = (integration.name, integration.id) in shared_defaults
+        by_key = {
+            **{(0, i.id): i for i in results_project},
+            **{(1, i.id): i for i in shared},
+        }
+        # rows deleted between the two reads are left out of the page
+        return [by_key[(origin, id_)] for _, origin, id_ in keys if (origin, id_) in by_key], next_cursor
 
     @rpc('update_attrs')
     def update_attrs(self,
@@ -501,13 +939,17 @@ class RPC:
                     IntegrationProject.id == integration_id
                 ).update(update_dict)
                 tenant_session.commit()
+                self.invalidate_project_caches(project_id)
                 if return_result:
                     return tenant_session.query(IntegrationProject).get(integration_id).to_json()
         else:
+            if 'config' in update_dict:
+                update_dict['is_shared'] = bool((update_dict['config'] or {}).get('is_shared'))
             IntegrationAdmin.query.filter(
                 IntegrationAdmin.id == integration_id
             ).update(update_dict)
             IntegrationAdmin.commit()
+            self.invalidate_shared_integrations()
             if return_result:
                 return IntegrationAdmin.query.get(integration_id).to_json()
 
@@ -530,6 +972,11 @@ class RPC:
                                                          )
                 tenant_session.add(default_integration)
                 tenant_session.commit()
+        self.invalidate_project_caches(project_id)
+        # other processes cache is_default and the default-first order as well
+        self.context.event_manager.fire_event(
+            'integration_default_changed', {'project_id': project_id, 'integration_name': integration.name}
+        )
 
     @rpc('delete_default_integration')
     def delete_default_integration(self, integration, project_id):
@@ -541,6 +988,10 @@ class RPC:
             ).one_or_none():
                 tenant_session.delete(default_integration)
                 tenant_session.commit()
+        self.invalidate_project_caches(project_id)
+        self.context.event_manager.fire_event(
+            'integration_default_changed', {'project_id': project_id, 'integration_name': integration.name}
+        )
 
     @rpc('get_defaults')
     def get_defaults(self, project_id, name=None):
@@ -550,9 +1001,11 @@ class RPC:
                         IntegrationDefault.name == name,
                 ).one_or_none():
                     return IntegrationDefaultPD.from_orm(integration)
+                if inherited := _lazy_shared_defaults().get(name):
+                    return inherited.copy()
             else:
-                results = tenant_session.query(IntegrationDefault).all()
-                return parse_obj_as(List[IntegrationDefaultPD], results)
+                results = parse_obj_as(List[IntegrationDefaultPD], tenant_session.query(IntegrationDefault).all())
+                return results + _inherited_defaults({i.name for i in results})
 
     @rpc('get_admin_defaults')
     def get_admin_defaults(self, name=None):
@@ -561,84 +1014,65 @@ class RPC:
                     IntegrationAdmin.is_default == True,
                     IntegrationAdmin.name == name,
             ).one_or_none():
-                return IntegrationPD.from_orm(integration)
+                return IntegrationPD.from_db(integration)
         else:
             results = IntegrationAdmin.query.filter(
                 IntegrationAdmin.is_default == True,
             ).all()
-            return parse_obj_as(List[IntegrationPD], results)
+            return [IntegrationPD.from_db(i) for i in results]
 
     @rpc('is_default')
     def is_default(self, project_id, integration_data):
         with db.with_project_schema_session(project_id) as tenant_session:
-            return tenant_session.query(IntegrationDefault).filter(
-                IntegrationDefault.name == integration_data['name'],
-                IntegrationDefault.is_default == True,
-                IntegrationDefault.integration_id == integration_data['id'],
-                IntegrationDefault.project_id == integration_data['project_id'],
-            ).one_or_none()
+            if default := tenant_session.query(IntegrationDefault).filter(
+                    IntegrationDefault.name == integration_data['name'],
+                    IntegrationDefault.is_default == True,
+                    IntegrationDefault.integration_id == integration_data['id'],
+                    IntegrationDefault.project_id == integration_data['project_id'],
+            ).one_or_none():
+                return default
+            if integration_data['project_id'] is None and not tenant_session.query(
+                    tenant_session.query(IntegrationDefault).filter(
+                        IntegrationDefault.name == integration_data['name'],
+                        IntegrationDefault.is_default == True,
+                    ).exists()
+            ).scalar():
+                inherited = _lazy_shared_defaults().get(integration_data['name'])
+                if inherited and inherited.integration_id == integration_data['id']:
+                    # same type as a stored pointer, but transient: there is no row for it
+                    return IntegrationDefault(
+                        name=inherited.name,
+                        integration_id=inherited.integration_id,
+                        project_id=None,
+                        is_default=True,
+                        section=inherited.section,
+                    )
 
     @rpc('get_s3_settings')
+    @single_flight
     def get_s3_settings(self, project_id, integration_id=None, is_local=True):
-        integration_name = 's3_integration'
-        try:
-            if integration_id and is_local:
-                with db.with_project_schema_session(project_id) as tenant_session:
-                    if integration_db := tenant_session.query(IntegrationProject).filter(
-                            IntegrationProject.id == integration_id,
-                            IntegrationProject.name == integration_name
-                    ).one_or_none():
-                        return _usecret_field(integration_db, project_id, is_local=True)
-            elif integration_id:
-                if integration_db := IntegrationAdmin.query.filter(
-                        IntegrationAdmin.id == integration_id,
-                        IntegrationAdmin.name == integration_name,
-                        IntegrationAdmin.config['is_shared'].astext.cast(Boolean) == True
-                ).one_or_none():
-                    return _usecret_field(integration_db, project_id, is_local=False)
-            # in case if integration_id is not provided - try to find default integration:
-            else:
-                with db.with_project_schema_session(project_id) as tenant_session:
-                    default_integration = tenant_session.query(IntegrationDefault).filter(
-                        IntegrationDefault.name == integration_name
-                    ).one_or_none()
-                    if default_integration and default_integration.project_id:
-                        if integration_db := tenant_session.query(IntegrationProject).filter(
-                                IntegrationProject.id == default_integration.integration_id,
-                                IntegrationProject.name == integration_name
-                        ).one_or_none():
-                            return _usecret_field(integration_db, project_id, is_local=True)
-                    elif default_integration:
-                        if integration_db := IntegrationAdmin.query.filter(
-                                IntegrationAdmin.id == default_integration.integration_id,
-                                IntegrationAdmin.name == integration_name,
-                                IntegrationAdmin.config['is_shared'].astext.cast(Boolean) == True
-                        ).one_or_none():
-                            return _usecret_field(integration_db, project_id, is_local=False)
-        except Exception as e:
-            log.warning(f'Cannot receive S3 settings for project {project_id}')
-            log.debug(e)
+        # invalidate_project_caches matches keys by int project id
+        project_id = int(project_id)
+        key = (project_id, integration_id, is_local)
+        if (settings := self.s3_settings_cache.get(key)) is None:
+            generation = self.s3_settings_cache.generation
+            settings = _resolve_s3_settings(project_id, integration_id, is_local)
+            if settings is None:
+                return None
+            self.s3_settings_cache.set(key, settings, generation=generation)
+        return deepcopy(settings)
 
     @rpc('get_s3_admin_settings')
+    @single_flight
     def get_s3_admin_settings(self, integration_id=None):
-        integration_name = 's3_integration'
-        try:
-            if integration_id:
-                if integration_db := IntegrationAdmin.query.filter(
-                        IntegrationAdmin.id == integration_id,
-                        IntegrationAdmin.name == integration_name,
-                ).one_or_none():
-                    return _usecret_field(integration_db, None, is_local=False)
-            # in case if integration_id is not provided - try to find default integration:
-            else:
-                if integration_db := IntegrationAdmin.query.filter(
-                        IntegrationAdmin.name == integration_name,
-                        IntegrationAdmin.is_default == True,
-                ).one_or_none():
-                    return _usecret_field(integration_db, None, is_local=False)
-        except Exception as e:
-            log.warning(f'Cannot receive S3 settings in administration mode')
-            log.debug(e)
+        key = ('administration', integration_id)
+        if (settings := self.s3_settings_cache.get(key)) is None:
+            generation = self.s3_settings_cache.generation
+            settings = _resolve_s3_admin_settings(integration_id)
+            if settings is None:
+                return None
+            self.s3_settings_cache.set(key, settings, generation=generation)
+        return deepcopy(settings)
 
     # @rpc('create_default_s3_for_new_project')
     # def create_default_s3_for_new_project(self, project_id):
@@ -666,14 +1100,124 @@ class RPC:
         setting_name: str,
         setting_value
     ):
-        integrations = []
+        """
+        Integrations whose parsed settings have setting_name equal to setting_value.
+        Rows are prefiltered in SQL on stored settings where the settings model keeps the value
+        as stored (see _setting_value_filter), otherwise all rows of the integration are parsed and compared
+        """
+        if integration_name not in self.integrations.keys():
+            return []
+        settings_model = self.integrations[integration_name].settings_model
         if project_id is None:
-            ints = self.get_administration_integrations_by_name(integration_name)
+            settings_filter = _setting_value_filter(
+                IntegrationAdmin.settings, settings_model, setting_name, setting_value
+            )
+            if settings_filter is None:
+                ints = self.get_administration_integrations_by_name(integration_name)
+            else:
+                ints = IntegrationAdmin.query.filter(
+                    IntegrationAdmin.name == integration_name,
+                    settings_filter,
+                ).order_by(
+                    asc(IntegrationAdmin.section),
+                    desc(IntegrationAdmin.is_default),
+                    asc(IntegrationAdmin.name),
+                    desc(IntegrationAdmin.id)
+                ).all()
+                ints = [IntegrationPD.from_db(i) for i in ints]
         else:
-            ints = self.get_project_integrations_by_name(project_id, integration_name)
+            settings = IntegrationProject.settings
+            if not self.tenant_migrations.has_version(project_id, TENANT_JSONB_VERSION):
+                # tenant schema is not migrated yet, the column may still be json
+                settings = cast(settings, JSONB)
+            settings_filter = _setting_value_filter(settings, settings_model, setting_name, setting_value)
+            if settings_filter is None:
+                ints = self.get_project_integrations_by_name(project_id, integration_name)
+            else:
+                ints, _ = _query_project_integrations(
+                    project_id,
+                    IntegrationProject.name == integration_name,
+                    settings_filter,
+                    order_by=_PROJECT_BY_NAME_ORDER
+                )
+        return [i for i in ints if i.settings.get(setting_name) == setting_value]
+
+    @rpc('migrate_tenant_schemas')
+    def migrate_tenant_schemas(self, project_ids: Optional[List[int]] = None, workers: Optional[int] = None,
+                               background: bool = False) -> Optional[dict]:
+        """
+        Apply pending integration table changes (see utils.migrations) to tenant schemas in parallel.
+        Schemas already at the target version are skipped, so an interrupted run can simply be repeated
+        :param project_ids: projects to migrate, all projects if None
+        :param workers: size of the worker pool, tenant_migration_workers from config if None
+        :param background: return immediately, progress is available from tenant_migration_status
+        :return: migration status
+        """
+        if project_ids is None:
+            project_ids = [p['id'] for p in self.context.rpc_manager.call.project_list()]
+        if background:
+            threading.Thread(
+                target=self.tenant_migrations.run, args=(project_ids, workers),
+                name='integrations_tenant_migration', daemon=True
+            ).start()
+            return None
+        return self.tenant_migrations.run(project_ids, workers)
 
-        for integration in ints:
-            if integration.settings.get(setting_name) == setting_value:
-                integrations.append(integration)
+    @rpc('tenant_migration_status')
+    def tenant_migration_status(self) -> dict:
+        return self.tenant_migrations.status()
 
-        return integrations
+    @rpc('run_health_probe')
+    def run_health_probe(self, project_ids: Optional[List[int]] = None) -> dict:
+        """
+        Probe connections now and store results in status/task_id, same as a scheduled round
+        :param project_ids: projects to probe, all projects if None
+        :return: probe status
+        """
+        return self.health_prober.run(project_ids)
+
+    @rpc('health_probe_status')
+    def health_probe_status(self) -> dict:
+        return self.health_prober.status()
+
+    @rpc('invalidate_secrets')
+    def invalidate_secrets(self, project_id: Optional[int] = None) -> None:
+        """ Drop cached secrets snapshot of project, or all snapshots if project_id is None """
+        self.invalidate_secrets_cache(project_id)
+
+    @rpc('get_default_model')
+    @single_flight
+    def get_default_model(self, project_id: int) -> Optional[dict]:
+        """
+        Default model of ai section in project, cached until ai integrations or secrets of project change
+        :return: {'integration_id', 'model_id', 'source'}, source is 'secret' when it comes from
+            'default_model' project secret and 'first_chat' for the first chat model fallback.
+            None if project has no chat models
+        """
+        project_id = int(project_id)
+        generation = self.default_model_cache.generation
+        cacheable = True
+        try:
+            secret = secrets_snapshot(project_id).get('default_model')
+        except Exception as e:
+            log.debug(f'Could not retrieve default_model secret for project {project_id}: {e}')
+            secret, cacheable = None, False
+        # cached together with the secret it was resolved from, a changed secret is noticed
+        # as soon as the secrets snapshot is refreshed
+        cached_secret, default_model = self.default_model_cache.get(project_id, (_UNSET, None))
+        if not cacheable or cached_secret != secret:
+            default_model = resolve_default_model(
+                ((i.id, i.settings.get('models')) for i in self.get_all_integrations_by_section(project_id, 'ai')),
+                parse_default_model(secret)
+            )
+            if cacheable:
+                self.default_model_cache.set(project_id, (secret, default_model), generation=generation)
+        return dict(default_model) if default_model else None
+
+    @rpc('settings_changed_fanout_status')
+    def settings_changed_fanout_status(self, job_id: Optional[str] = None) -> Optional[dict] | List[dict]:
+        """
+        Progress of integration_settings_changed dispatch for shared integrations
+        :param job_id: one job, recent jobs if None
+        """
+        return self.settings_changed_fanout.status(job_id)
@@ -0,0 +1,102 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from pylon.core.tools import log
+
+from .cache import LRUCache
+from .settings_memo import settings_digest
+from ..models.pd.integration import IntegrationPD
+from ..models.pd.registration import RegistrationForm
+
+
+def check_connection(integration: RegistrationForm, settings: dict, project_id: Optional[int]) -> dict:
+    """ Same check as the check_settings endpoint, for stored settings """
+    try:
+        response = integration.settings_model.parse_obj(settings).check_connection(project_id)
+    except Exception as e:
+        log.debug('Connection check of %s failed: %s', integration.name, e)
+        return {'ok': False, 'msg': str(e)}
+    if response is True:
+        return {'ok': True, 'msg': None}
+    return {'ok': False, 'msg': response}
+
+
+class ConnectionChecker:
+    """
+    Checks connections of many integrations on a bounded pool, each check limited by `timeout`.
+    Results are cached by integration and settings hash for `cache_ttl` seconds
+    """
+
+    def __init__(self, workers: int = 8, timeout: float = 10, cache_ttl: float = 300, cache_size: int = 4096):
+        self.workers = workers
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='integrations_check')
+        self.results = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.results.clear()
+
+    @staticmethod
+    def _cache_key(integration: IntegrationPD) -> tuple:
+        return integration.uid, integration.project_id, settings_digest(integration.settings)
+
+    def _run(self, started: Dict[int, float], index: int, *args) -> dict:
+        started[index] = time.monotonic()
+        return check_connection(*args)
+
+    def check(self, integrations: List[IntegrationPD], registrations: Dict[str, RegistrationForm],
+              use_cache: bool = True) -> List[dict]:
+        """
+        :param integrations: integrations to check, their settings are used as stored
+        :param registrations: registered integrations by name
+        :param use_cache: False - ignore cached results (fresh results are still cached)
+        :return: one result per integration, in the same order
+        """
+        results = [
+            {
+                'id': i.id, 'uid': i.uid, 'name': i.name, 'project_id': i.project_id,
+                'ok': False, 'msg': None, 'cached': False,
+            }
+            for i in integrations
+        ]
+        futures = dict()
+        started: Dict[int, float] = dict()
+        for index, integration in enumerate(integrations):
+            registration = registrations.get(integration.name)
+            if not registration or not registration.settings_model:
+                results[index]['msg'] = 'integration not found'
+                continue
+            if use_cache and (cached := self.results.get(self._cache_key(integration))):
+                results[index].update(cached, cached=True)
+                continue
+            future = self.pool.submit(
+                self._run, started, index, registration, integration.settings, integration.project_id
+            )
+            futures[future] = index
+        #
+        # queued checks can not time out before they start, but everything is over after
+        # every pool slot had the chance to run `timeout` long checks back to back
+        deadline = time.monotonic() + self.timeout * (len(futures) // self.workers + 2)
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            for future in [f for f in pending if now - started.get(futures[f], now) > self.timeout]:
+                pending.discard(future)
+                future.cancel()
+                results[futures[future]]['msg'] = 'timeout'
+            if not pending:
+                break
+            if now > deadline:
+                for future in pending:
+                    future.cancel()
+                    results[futures[future]]['msg'] = 'timeout'
+                break
+            done, pending = wait(pending, timeout=min(1.0, self.timeout), return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                index = futures[future]
+                results[index].update(result)
+                self.results.set(self._cache_key(integrations[index]), result)
+        return results
@@ -0,0 +1,65 @@
+from typing import Iterable, Optional, Tuple
+
+from pylon.core.tools import log
+
+
+def _is_chat_model(model: dict) -> bool:
+    return bool(model.get('capabilities', {}).get('chat_completion', False))
+
+
+def parse_default_model(secret: Optional[str]) -> Optional[Tuple[int, str]]:
+    """ default_model secret is integration_id___model_id """
+    if not secret or '___' not in secret:
+        return None
+    integration_id, model_id = secret.split('___', 1)
+    if not model_id:
+        return None
+    try:
+        return int(integration_id), model_id
+    except ValueError:
+        log.debug('Malformed default_model secret: %s', secret)
+        return None
+
+
+def resolve_default_model(integrations: Iterable[Tuple[int, list]], target: Optional[Tuple[int, str]]
+                          ) -> Optional[dict]:
+    """
+    Project default model: the one from default_model secret if it exists,
+    otherwise the first chat model of the first integration which has one
+    :param integrations: (integration id, models) of ai integrations in listing order
+    :param target: parsed default_model secret
+    :return: {'integration_id', 'model_id', 'source'} or None if there are no chat models
+    """
+    fallback = None
+    for integration_id, models in integrations:
+        for model in models or []:
+            if target and (integration_id, model.get('id')) == target:
+                return {'integration_id': integration_id, 'model_id': model.get('id'), 'source': 'secret'}
+            if fallback is None and _is_chat_model(model):
+                fallback = {'integration_id': integration_id, 'model_id': model.get('id'), 'source': 'first_chat'}
+    return fallback
+
+
+def mark_default_models(integrations: list, default_model: Optional[dict]) -> None:
+    """
+    Set 'default' of every model in serialized integrations: the default model from secret
+    where it belongs, the first chat model in every other integration
+    """
+    target = None
+    if default_model and default_model['source'] == 'secret':
+        target = default_model['integration_id'], default_model['model_id']
+    for integration in integrations:
+        if not (integration.get('settings') and integration['settings'].get('models')):
+            continue
+        models = integration['settings']['models']
+        matches_target = target is not None and integration.get('id') == target[0]
+        target_index = chat_index = None
+        for index, model in enumerate(models):
+            model['default'] = False
+            if target_index is None and matches_target and model.get('id') == target[1]:
+                target_index = index
+            if chat_index is None and _is_chat_model(model):
+                chat_index = index
+        default_index = target_index if target_index is not None else chat_index
+        if default_index is not None:
+            models[default_index]['default'] = True
@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from uuid import uuid4
+
+from pylon.core.tools import log
+
+from .cache import LRUCache
+
+
+class SettingsChangedFanout:
+    """
+    Fires integration_settings_changed of a shared integration for every project,
+    `chunk_size` project ids per event, off the request thread.
+    Jobs run one at a time in submission order, so events of consecutive edits do not interleave
+    """
+
+    def __init__(self, module, chunk_size: int = 500, history_size: int = 256):
+        self.module = module
+        self.chunk_size = chunk_size
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='integrations_fanout')
+        self.jobs = LRUCache(maxsize=history_size)
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def dispatch(self, integration_uid: str, old_settings: dict, new_settings: dict) -> str:
+        """ :return: job id for status() """
+        job_id = str(uuid4())
+        self.jobs.set(job_id, {
+            'id': job_id, 'integration_uid': integration_uid, 'status': 'queued',
+            'total': None, 'dispatched': 0, 'error': None, 'created': time.time(), 'finished': None,
+        })
+        self.pool.submit(self._run, job_id, integration_uid, old_settings, new_settings)
+        return job_id
+
+    def status(self, job_id: Optional[str] = None) -> Optional[dict] | List[dict]:
+        if job_id:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+        return [dict(job) for job in self.jobs.values()]
+
+    def _run(self, job_id: str, integration_uid: str, old_settings: dict, new_settings: dict) -> None:
+        job = self.jobs.get(job_id) or {}
+        job['status'] = 'running'
+        try:
+            projects = self.module.context.rpc_manager.call.project_list(filter_={'create_success': True})
+            project_ids = [p['id'] for p in projects]
+            job['total'] = len(project_ids)
+            for start in range(0, len(project_ids), self.chunk_size):
+                chunk = project_ids[start:start + self.chunk_size]
+                self.module.context.event_manager.fire_event(
+                    "integration_settings_changed",
+                    {
+                        "project_ids": chunk,
+                        "integration_uid": integration_uid,
+                        "old_settings": old_settings,
+                        "new_settings": new_settings
+                    }
+                )
+                job['dispatched'] += len(chunk)
+            job['status'] = 'done'
+        except Exception as e:
+            log.error('Cannot dispatch settings change of integration %s: %s', integration_uid, e)
+            job['status'] = 'failed'
+            job['error'] = str(e)
+        finally:
+            job['finished'] = time.time()
@@ -0,0 +1,137 @@
+import random
+import threading
+import time
+from typing import List, Optional
+from uuid import uuid4
+
+from pylon.core.tools import log
+from sqlalchemy import bindparam, or_, update
+
+from tools import db
+
+from .connection_checks import ConnectionChecker
+from ..models.integration import IntegrationAdmin, IntegrationProject
+from ..models.pd.integration import IntegrationPD
+
+
+TASK_ID_PREFIX = 'health_probe:'
+
+
+def _owned_by_prober(status: Optional[str], task_id: Optional[str]) -> bool:
+    """ Rows with a pending or otherwise task-owned status are left to their task """
+    return status != 'pending' and (not task_id or task_id.startswith(TASK_ID_PREFIX))
+
+
+def _probe_status(result: dict) -> str:
+    if result['ok']:
+        return 'success'
+    return f'failed: {result["msg"]}'[:256] if result['msg'] else 'failed'
+
+
+class HealthProber:
+    """
+    Periodically checks connections of all integrations and stores the outcome in their
+    status and task_id columns, one batched update per schema.
+    Rows a task is working on (pending, or task_id not written by the prober) are left alone.
+    Rounds start every `interval` seconds, shifted by up to `jitter` of it
+    """
+
+    def __init__(self, module, interval: float = 900, jitter: float = 0.1,
+                 workers: int = 4, timeout: float = 10):
+        self.module = module
+        self.interval = interval
+        self.jitter = jitter
+        self.checker = ConnectionChecker(workers=workers, timeout=timeout, cache_ttl=interval)
+        self.progress = {'running': False, 'task_id': None, 'started': None, 'finished': None, 'failed': []}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='integrations_health_probe', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.checker.shutdown()
+
+    def status(self) -> dict:
+        return {**self.progress, 'failed': list(self.progress['failed'])}
+
+    def _loop(self) -> None:
+        # random first delay, so restarted instances do not probe in lockstep
+        delay = random.uniform(0, self.interval * self.jitter)
+        while not self._stop.wait(delay):
+            try:
+                self.run()
+            except Exception as e:
+                log.error('Integrations health probe round failed: %s', e)
+            delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def run(self, project_ids: Optional[List[int]] = None) -> dict:
+        """ One probe round over administration integrations and all (or given) projects """
+        task_id = f'{TASK_ID_PREFIX}{uuid4()}'
+        self.progress = {
+            'running': True, 'task_id': task_id, 'started': time.time(), 'finished': None, 'failed': []
+        }
+        try:
+            self._probe_schema(None, task_id)
+            if project_ids is None:
+                project_ids = [p['id'] for p in self.module.context.rpc_manager.call.project_list()]
+            project_ids = list(project_ids)
+            random.shuffle(project_ids)
+            for project_id in project_ids:
+                if self._stop.is_set():
+                    break
+                try:
+                    self._probe_schema(project_id, task_id)
+                except Exception as e:
+                    log.warning('Cannot probe integrations of project %s: %s', project_id, e)
+                    self.progress['failed'].append(project_id)
+        finally:
+            self.progress['running'] = False
+            self.progress['finished'] = time.time()
+        return self.status()
+
+    def _probe_schema(self, project_id: Optional[int], task_id: str) -> None:
+        if project_id is None:
+            model = IntegrationAdmin
+            integrations: List[IntegrationPD] = self.module.get_administration_integrations(group_by_section=False)
+        else:
+            model = IntegrationProject
+            integrations = self.module.get_project_integrations(project_id, group_by_section=False)
+        # integrations of unloaded plugins can not be probed, their status is left as is
+        integrations = [
+            i for i in integrations
+            if i.name in self.module.integrations and self.module.integrations[i.name].settings_model
+            and _owned_by_prober(i.status, i.task_id)
+        ]
+        if not integrations:
+            return
+        #
+        results = self.checker.check(integrations, self.module.integrations, use_cache=False)
+        rows = []
+        changed = False
+        for integration, result in zip(integrations, results):
+            status = _probe_status(result)
+            changed = changed or status != integration.status
+            rows.append({'row_id': integration.id, 'new_status': status, 'new_task_id': task_id})
+        # a task may have taken the row since it was read, check ownership again in the update itself
+        table = model.__table__
+        statement = update(table).where(
+            table.c.id == bindparam('row_id'),
+            table.c.status.is_distinct_from('pending'),
+            or_(table.c.task_id.is_(None), table.c.task_id == '', table.c.task_id.startswith(TASK_ID_PREFIX)),
+        ).values(status=bindparam('new_status'), task_id=bindparam('new_task_id'))
+        with (db.get_session() if project_id is None else db.get_session(project_id)) as session:
+            session.execute(statement, rows)
+            session.commit()
+        if not changed:
+            return
+        if project_id is None:
+            # administration integrations are merged into project reads when shared
+            self.module.invalidate_shared_integrations()
+        else:
+            self.module.invalidate_project_caches(project_id)
@@ -0,0 +1,228 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pylon.core.tools import log
+from sqlalchemy import DDL, Table
+
+from tools import db
+
+from ..models.integration import IntegrationAdmin, IntegrationProject, IntegrationDefault, \
+    IntegrationSchemaMigration
+
+
+def _json_to_jsonb(table: Table, column: str) -> DDL:
+    # %(fullname)s is rendered with the same schema mapping as regular queries,
+    # so one statement works for the shared schema and for every tenant schema
+    return DDL(f'''
+        DO $$ BEGIN
+            IF (
+                SELECT atttypid FROM pg_attribute
+                WHERE attrelid = '%(fullname)s'::regclass AND attname = '{column}'
+            ) = 'json'::regtype THEN
+                ALTER TABLE %(fullname)s ALTER COLUMN {column} TYPE jsonb USING {column}::jsonb;
+            END IF;
+        END $$
+    ''').against(table)
+
+
+def _gin_index(table: Table, column: str) -> DDL:
+    return DDL(
+        f'CREATE INDEX IF NOT EXISTS ix_integration_{column}_gin '
+        f'ON %(fullname)s USING gin ({column} jsonb_path_ops)'
+    ).against(table)
+
+
+def _index(table: Table, name: str, column: str) -> DDL:
+    return DDL(f'CREATE INDEX IF NOT EXISTS {name} ON %(fullname)s ({column})').against(table)
+
+
+def _required_unique_uid(table: Table) -> List[DDL]:
+    """ uid column used to be added by hand, bring older schemas to the model definition """
+    return [
+        DDL('ALTER TABLE %(fullname)s ADD COLUMN IF NOT EXISTS uid VARCHAR(128)').against(table),
+        DDL('UPDATE %(fullname)s SET uid = gen_random_uuid()::text WHERE uid IS NULL').against(table),
+        DDL('ALTER TABLE %(fullname)s ALTER COLUMN uid SET NOT NULL').against(table),
+        DDL('''
+            DO $$ BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_index i
+                    JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+                    WHERE i.indrelid = '%(fullname)s'::regclass
+                        AND i.indisunique AND i.indnatts = 1 AND a.attname = 'uid'
+                ) THEN
+                    CREATE UNIQUE INDEX integration_uid_key ON %(fullname)s (uid);
+                END IF;
+            END $$
+        ''').against(table),
+    ]
+
+
+SHARED_MIGRATIONS: List[DDL] = [
+    _json_to_jsonb(IntegrationAdmin.__table__, 'settings'),
+    _json_to_jsonb(IntegrationAdmin.__table__, 'config'),
+    _gin_index(IntegrationAdmin.__table__, 'settings'),
+    DDL(
+        'ALTER TABLE %(fullname)s ADD COLUMN IF NOT EXISTS is_shared BOOLEAN NOT NULL DEFAULT false'
+    ).against(IntegrationAdmin.__table__),
+    DDL('''
+        UPDATE %(fullname)s SET is_shared = COALESCE((config ->> 'is_shared')::boolean, false)
+        WHERE is_shared IS DISTINCT FROM COALESCE((config ->> 'is_shared')::boolean, false)
+    ''').against(IntegrationAdmin.__table__),
+    DDL(
+        'CREATE INDEX IF NOT EXISTS ix_integration_shared ON %(fullname)s (name) WHERE is_shared'
+    ).against(IntegrationAdmin.__table__),
+    *_required_unique_uid(IntegrationAdmin.__table__),
+]
+
+# (version, statements) - append new versions, never edit applied ones.
+# Statements must stay idempotent: a failed version is re-run as a whole
+TENANT_MIGRATIONS: List[Tuple[int, List[DDL]]] = [
+    (1, [
+        _json_to_jsonb(IntegrationProject.__table__, 'settings'),
+        _json_to_jsonb(IntegrationProject.__table__, 'config'),
+        _gin_index(IntegrationProject.__table__, 'settings'),
+    ]),
+    (2, [
+        *_required_unique_uid(IntegrationProject.__table__),
+        _index(IntegrationProject.__table__, 'ix_integration_project_id', 'project_id'),
+        _index(IntegrationProject.__table__, 'ix_integration_name', 'name'),
+        _index(IntegrationProject.__table__, 'ix_integration_section', 'section'),
+        _index(IntegrationDefault.__table__, 'ix_integration_default_integration_id', 'integration_id'),
+        _index(IntegrationDefault.__table__, 'ix_integration_default_project_id', 'project_id'),
+        _index(IntegrationDefault.__table__, 'ix_integration_default_name', 'name'),
+        _index(IntegrationDefault.__table__, 'ix_integration_default_section', 'section'),
+    ]),
+]
+TENANT_SCHEMA_VERSION = TENANT_MIGRATIONS[-1][0]
+# tenant settings/config are jsonb from this version on, before it they may still be json
+TENANT_JSONB_VERSION = 1
+
+
+def migrate_shared_schema() -> None:
+    with db.engine.begin() as connection:
+        for statement in SHARED_MIGRATIONS:
+            connection.execute(statement)
+
+
+def migrate_tenant_schema(project_id: int, from_version: int = 0) -> int:
+    """
+    Apply tenant migrations newer than from_version, recording progress after each version
+    :return: version the schema is at
+    """
+    version = from_version
+    with db.with_project_schema_session(project_id) as tenant_session:
+        for migration_version, statements in TENANT_MIGRATIONS:
+            if migration_version <= version:
+                continue
+            try:
+                for statement in statements:
+                    tenant_session.execute(statement)
+                tenant_session.commit()
+            except Exception as e:
+                tenant_session.rollback()
+                IntegrationSchemaMigration.save(project_id, version, error=str(e)[:1024])
+                raise
+            version = migration_version
+            IntegrationSchemaMigration.save(project_id, version)
+    return version
+
+
+class TenantMigrationRunner:
+    """
+    Brings integration tables of many tenant schemas to TENANT_SCHEMA_VERSION on a bounded pool.
+    Progress is stored per schema, so an interrupted run resumes where it stopped
+    """
+
+    def __init__(self, workers: int = 8):
+        self.workers = workers
+        self.progress = {'running': False, 'total': 0, 'done': 0, 'failed': []}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # versions only grow, so a known version is never outdated
+        self._versions: Dict[int, int] = dict()
+
+    def has_version(self, project_id: int, version: int) -> bool:
+        """ Whether the tenant schema of project is migrated at least to version """
+        if self._versions.get(project_id, 0) >= version:
+            return True
+        current = IntegrationSchemaMigration.version_of(project_id)
+        self._versions[project_id] = max(current, self._versions.get(project_id, 0))
+        return current >= version
+
+    def migrate(self, project_id: int, from_version: Optional[int] = None) -> int:
+        """ Migrate one tenant schema right away, e.g. of a new project """
+        if from_version is None:
+            from_version = IntegrationSchemaMigration.version_of(project_id)
+        version = migrate_tenant_schema(project_id, from_version)
+        self._versions[project_id] = version
+        return version
+
+    def start(self, list_projects: Callable[[], List[int]], retry_delay: float = 30, attempts: int = 10) -> None:
+        """
+        Migrate all tenant schemas in a background thread.
+        Projects may not be listable yet while plugins are loading, listing is retried
+        """
+        def _run():
+            for _ in range(attempts):
+                try:
+                    project_ids = list_projects()
+                except Exception as e:
+                    log.warning('Cannot list projects for tenant migration, retrying: %s', e)
+                    if self._stop.wait(retry_delay):
+                        return
+                    continue
+                try:
+                    self.run(project_ids)
+                except Exception as e:
+                    log.error('Tenant migration failed: %s', e)
+                return
+            log.error('Tenant migration was not started: projects could not be listed')
+
+        self._stop.clear()
+        threading.Thread(target=_run, name='integrations_tenant_migration', daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self, project_ids: List[int], workers: Optional[int] = None) -> dict:
+        with self._lock:
+            if self.progress['running']:
+                raise RuntimeError('Tenant migration is already running')
+            self.progress = {'running': True, 'total': 0, 'done': 0, 'failed': []}
+        try:
+            versions = IntegrationSchemaMigration.versions()
+            pending = [
+                project_id for project_id in project_ids
+                if versions.get(project_id, 0) < TENANT_SCHEMA_VERSION
+            ]
+            self.progress['total'] = len(pending)
+            log.info(
+                'Migrating integration tables of %s tenant schemas, %s already at version %s',
+                len(pending), len(project_ids) - len(pending), TENANT_SCHEMA_VERSION
+            )
+            with ThreadPoolExecutor(max_workers=workers or self.workers) as pool:
+                futures = {
+                    pool.submit(migrate_tenant_schema, project_id, versions.get(project_id, 0)): project_id
+                    for project_id in pending
+                }
+                for future in as_completed(futures):
+                    project_id = futures[future]
+                    try:
+                        self._versions[project_id] = future.result()
+                    except Exception as e:
+                        log.error('Cannot migrate integration tables of project %s: %s', project_id, e)
+                        self.progress['failed'].append(project_id)
+                    self.progress['done'] += 1
+        finally:
+            self.progress['running'] = False
+        return self.status()
+
+    def status(self) -> dict:
+        versions: Dict[int, int] = IntegrationSchemaMigration.versions()
+        return {
+            **self.progress,
+            'failed': list(self.progress['failed']),
+            'target_version': TENANT_SCHEMA_VERSION,
+            'up_to_date': sum(1 for v in versions.values() if v >= TENANT_SCHEMA_VERSION),
+        }
@@ -0,0 +1,20 @@
+import base64
+import json
+from typing import Any, Optional
+
+
+def encode_cursor(*values: Any) -> str:
+    """ Opaque page cursor from the sort key of the last returned row """
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[list]:
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Malformed cursor') from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Malformed cursor')
+    return values
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic.v1.main import ModelMetaclass
+
+
+class SchemaRegistry:
+    """
+    JSON schemas of integration settings models, computed once at registration time.
+    Serialized bytes and the etag are derived lazily and dropped on every change
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._schemas: Dict[str, Tuple[str, bytes]] = {}
+        self._serialized: Dict[Optional[str], bytes] = {}
+        self._etag: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, section: str, settings_model: Optional[ModelMetaclass]) -> None:
+        with self._lock:
+            if settings_model is None:
+                self._schemas.pop(name, None)
+            else:
+                self._schemas[name] = (section, settings_model.schema_json().encode())
+            self._changed()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._schemas.clear()
+            self._changed()
+
+    def _changed(self) -> None:
+        self.version += 1
+        self._serialized = {}
+        self._etag = None
+
+    def _section_parts(self, section: Optional[str]) -> List[bytes]:
+        return [
+            schema for schema_section, schema in self._schemas.values()
+            if not section or schema_section == section
+        ]
+
+    def schemas(self, section: Optional[str] = None) -> List[dict]:
+        return [json.loads(schema) for schema in self._section_parts(section)]
+
+    def serialized(self, sections: Iterable[Optional[str]]) -> bytes:
+        """ JSON array of schemas of all given sections, None stands for every section """
+        with self._lock:
+            parts = []
+            for section in sections:
+                if section not in self._serialized:
+                    section_parts = self._section_parts(section)
+                    if not section_parts:
+                        continue
+                    self._serialized[section] = b','.join(section_parts)
+                parts.append(self._serialized[section])
+            return b'[' + b','.join(parts) + b']'
+
+    @property
+    def etag(self) -> str:
+        """ Content hash, equal across processes with the same registered integrations """
+        with self._lock:
+            if self._etag is None:
+                digest = hashlib.sha1()
+                for name, (section, schema) in self._schemas.items():
+                    digest.update(f'{name}:{section}:'.encode())
+                    digest.update(schema)
+                self._etag = digest.hexdigest()
+            return self._etag
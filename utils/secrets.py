@@ -0,0 +1,24 @@
+from typing import Any, Optional
+
+from tools import VaultClient
+
+
+def secrets_snapshot(project_id: Optional[int]) -> dict:
+    """
+    VaultClient(project_id).get_all_secrets(), cached per project for secrets_cache_ttl seconds.
+    The snapshot is shared between callers - read it, never modify it
+    """
+    from tools import integrations_tools
+    cache = integrations_tools.secrets_cache
+    key = None if project_id is None else int(project_id)
+    secrets = cache.get(key)
+    if secrets is None:
+        generation = cache.generation
+        secrets = VaultClient(project_id).get_all_secrets()
+        cache.set(key, secrets, generation=generation)
+    return secrets
+
+
+def unsecret(value: Any, project_id: Optional[int]) -> Any:
+    """ VaultClient.unsecret resolved against the cached snapshot of project secrets """
+    return VaultClient(project_id).unsecret(value, secrets=secrets_snapshot(project_id))
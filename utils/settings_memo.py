@@ -0,0 +1,32 @@
+import hashlib
+import json
+from typing import Any
+
+from ..models.pd.registration import RegistrationForm
+
+
+def settings_digest(settings: dict) -> str:
+    """ Stable hash of raw settings json """
+    return hashlib.sha1(
+        json.dumps(settings, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def _copy_containers(value: Any) -> Any:
+    # parsed leaves are immutable, only dicts and lists need copying to protect the memo
+    if isinstance(value, dict):
+        return {k: _copy_containers(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_containers(v) for v in value]
+    return value
+
+
+def parse_settings(integration: RegistrationForm, settings: dict) -> dict:
+    """ integration.settings_model.parse_obj(settings).dict(), memoized by integration name and settings hash """
+    from tools import integrations_tools
+    key = (integration.name, settings_digest(settings))
+    parsed = integrations_tools.settings_memo.get(key)
+    if parsed is None:
+        parsed = integration.settings_model.parse_obj(settings).dict()
+        integrations_tools.settings_memo.set(key, parsed)
+    return _copy_containers(parsed)
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pylon.core.tools import log
+from sqlalchemy import asc, desc
+
+from tools import db
+
+from ..models.integration import IntegrationAdmin, IntegrationSharedVersion
+from ..models.pd.integration import IntegrationPD
+
+
+class AdminIntegrationsSnapshot:
+    """
+    Immutable view of administration integrations, hydrated once.
+    Keeps the database order (section, defaults first, name, newest first) in every grouping
+    """
+
+    def __init__(self, version: int, integrations: Iterable[IntegrationPD]):
+        self.version = version
+        self.integrations: Tuple[IntegrationPD, ...] = tuple(integrations)
+        by_name = defaultdict(list)
+        by_section = defaultdict(list)
+        for integration in self.integrations:
+            by_name[integration.name].append(integration)
+            by_section[integration.section.name].append(integration)
+        self.by_name: Dict[str, Tuple[IntegrationPD, ...]] = {k: tuple(v) for k, v in by_name.items()}
+        self.by_section: Dict[str, Tuple[IntegrationPD, ...]] = {k: tuple(v) for k, v in by_section.items()}
+
+    @staticmethod
+    def _select(integrations: Iterable[IntegrationPD], only_shared: bool,
+                names: Optional[Iterable[str]] = None) -> List[IntegrationPD]:
+        # integrations in the snapshot are shared between readers, hand out copies
+        names = None if names is None else set(names)
+        return [
+            i.copy(deep=True) for i in integrations
+            if (not only_shared or i.config.get('is_shared')) and (names is None or i.name in names)
+        ]
+
+    def all(self, names: Iterable[str], only_shared: bool = False) -> List[IntegrationPD]:
+        return self._select(self.integrations, only_shared, names)
+
+    def with_name(self, name: str, only_shared: bool = False) -> List[IntegrationPD]:
+        return self._select(self.by_name.get(name, ()), only_shared)
+
+    def in_section(self, section: str, only_shared: bool = False) -> List[IntegrationPD]:
+        return self._select(self.by_section.get(section, ()), only_shared)
+
+
+class AdminIntegrationsStore:
+    """
+    Process-wide AdminIntegrationsSnapshot. Rebuilt after invalidate() in this process,
+    and after another process bumped IntegrationSharedVersion (checked every `check_interval` seconds)
+    """
+
+    def __init__(self, check_interval: float = 5, on_outdated: Optional[Callable[[], None]] = None):
+        """ :param on_outdated: called when a change made by another process is noticed """
+        self.check_interval = check_interval
+        self.on_outdated = on_outdated
+        self._snapshot: Optional[AdminIntegrationsSnapshot] = None
+        self._generation = 0
+        self._built_generation = -1
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> AdminIntegrationsSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None or self._built_generation != self._generation:
+            return self.rebuild(snapshot)
+        if time.monotonic() - self._checked_at > self.check_interval:
+            self._checked_at = time.monotonic()
+            try:
+                if IntegrationSharedVersion.current() != snapshot.version:
+                    snapshot = self.rebuild(snapshot)
+                    if self.on_outdated:
+                        self.on_outdated()
+            except Exception as e:
+                log.warning('Cannot check administration integrations version: %s', e)
+        return snapshot
+
+    def rebuild(self, stale: Optional[AdminIntegrationsSnapshot] = None) -> AdminIntegrationsSnapshot:
+        """ :param stale: snapshot the caller found outdated, skip the rebuild if somebody replaced it meanwhile """
+        with self._lock:
+            generation = self._generation
+            if stale is not None and self._snapshot is not stale and self._built_generation == generation:
+                return self._snapshot
+            version = IntegrationSharedVersion.current()
+            with db.get_session() as session:
+                rows = session.query(IntegrationAdmin).order_by(
+                    asc(IntegrationAdmin.section),
+                    desc(IntegrationAdmin.is_default),
+                    asc(IntegrationAdmin.name),
+                    desc(IntegrationAdmin.id)
+                ).all()
+                snapshot = AdminIntegrationsSnapshot(version, [IntegrationPD.from_db(i) for i in rows])
+            # swap the whole snapshot at once, readers keep the one they already have
+            self._snapshot = snapshot
+            self._built_generation = generation
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    def invalidate(self, bump: bool = True) -> None:
+        """
+        :param bump: administration integrations changed - let other processes know as well,
+            False when only local hydration is outdated (e.g. an integration was registered)
+        """
+        if bump:
+            try:
+                IntegrationSharedVersion.bump()
+            except Exception as e:
+                log.warning('Cannot bump administration integrations version: %s', e)
+        self._generation += 1
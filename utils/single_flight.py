@@ -0,0 +1,114 @@
+import inspect
+import threading
+from copy import deepcopy
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from pydantic.v1 import BaseModel
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm.state import InstanceState
+
+
+def _copy_row(value: Any, state: InstanceState) -> Any:
+    """ Transient copy of an ORM instance with its loaded attributes, callers may modify rows they get """
+    copy = state.manager.new_instance()
+    for key, attr_value in value.__dict__.items():
+        if not key.startswith('_sa_'):
+            setattr(copy, key, deepcopy(attr_value))
+    return copy
+
+
+def _copy_result(value: Any) -> Any:
+    """ Followers get their own copy of pydantic models, ORM rows and containers """
+    if isinstance(value, BaseModel):
+        return value.copy(deep=True)
+    if isinstance(state := sa_inspect(value, raiseerr=False), InstanceState):
+        return _copy_row(value, state)
+    if isinstance(value, list):
+        return [_copy_result(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_copy_result(v) for v in value)
+    if isinstance(value, dict):
+        return deepcopy(value)
+    return value
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution: the first caller runs it,
+    the others wait for its result. Nothing is kept once the call is finished
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = dict()
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any], copy_result: Callable[[Any], Any] = _copy_result) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy_result(call.result)
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                # nobody can join any more, followers copy from call.result while the leader uses its own
+                shared = call.followers > 0
+            call.done.set()
+        return copy_result(call.result) if shared else call.result
+
+    def forget(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> None:
+        """
+        Calls started before a write may return data from before it: new callers
+        start their own call instead of joining those. Callers already waiting still get them
+        """
+        with self._lock:
+            for key in [k for k in self._calls if predicate is None or predicate(k)]:
+                del self._calls[key]
+
+
+flights = SingleFlight()
+
+
+def single_flight(func: Callable) -> Callable:
+    """
+    Coalesce concurrent calls of a read RPC with the same arguments through `flights`.
+    Calls with unhashable arguments run on their own
+    """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (func.__name__, *tuple(bound.arguments.items())[1:])
+        try:
+            hash(key)
+        except TypeError:
+            return func(self, *args, **kwargs)
+        return flights.do(key, lambda: func(self, *args, **kwargs))
+
+    return wrapper
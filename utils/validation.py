@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import Future
+from queue import Empty
+from typing import Dict, Optional
+
+from pydantic.v1 import ValidationError
+from pylon.core.tools import log
+
+
+class ValidatorRegistry:
+    """
+    Which {kind}_test_create_integration_validate_<name> RPCs exist, as declared by plugins.
+    Once a validator of a kind is declared, that kind is declaration based: undeclared
+    validators of it are taken as absent and not called. Kinds nobody declared for are tried.
+    A timeout is not taken as absence: a slow or restarting plugin would otherwise lose its validation
+    """
+
+    def __init__(self, strict: bool = False):
+        """ :param strict: treat undeclared validators as absent for kinds nobody declared for as well """
+        self.strict = strict
+        self._declared: Dict[str, Dict[str, bool]] = dict()
+        self._lock = threading.Lock()
+
+    def declare(self, kind: str, integration_name: str, available: bool = True) -> None:
+        with self._lock:
+            self._declared.setdefault(kind, dict())[integration_name] = available
+
+    def declared(self) -> Dict[str, Dict[str, bool]]:
+        with self._lock:
+            return {kind: dict(sorted(names.items())) for kind, names in self._declared.items()}
+
+    def is_available(self, kind: str, integration_name: str) -> Optional[bool]:
+        """ True - declared, False - declared absent or undeclared in a declared kind, None - unknown """
+        declared = self._declared.get(kind)
+        if declared is None:
+            return False if self.strict else None
+        return declared.get(integration_name, False)
+
+
+def _missing_validator() -> Future:
+    future = Future()
+    future.set_exception(Empty())
+    return future
+
+
+def validate_test_integrations(module, kind: str, data: dict, skip_validation_if_undefined: bool = True,
+                               **kwargs) -> dict:
+    """
+    Runs {kind}_test_create_integration_validate_<name> for every integration of a test at once.
+    Every call keeps its own 1s timeout and is waited for, only an RPC timeout means the validator is undefined.
+    Results and errors are processed in data order, so the reported error is the same as with
+    sequential validation. Validators declared absent (see ValidatorRegistry) are not called
+    """
+    calls = [
+        (section, k, v)
+        for section, integration in data.items()
+        for k, v in integration.items()
+    ]
+    registry = module.test_create_validators
+    futures = [
+        module.validation_pool.submit(
+            module.context.rpc_manager.call_function_with_timeout,
+            func=f'{kind}_test_create_integration_validate_{k}',
+            timeout=1,
+            data=v,
+            **kwargs
+        ) if registry.is_available(kind, k) is not False else _missing_validator()
+        for _, k, v in calls
+    ]
+    integration_data = {section: dict() for section in data}
+    for (section, k, v), future in zip(calls, futures):
+        try:
+            integration_data[section][k] = future.result()
+        except Empty:
+            log.warning(f'Cannot validate integration data for {k}')
+            if skip_validation_if_undefined:
+                integration_data[section][k] = v
+        except ValidationError as e:
+            for i in e.errors():
+                i['loc'] = [f'{section}_{k}', *i['loc']]
+            raise e
+        except Exception as e:
+            e.loc = [f'{section}_{k}', *getattr(e, 'loc', [])]
+            raise e
+    return {'integrations': integration_data}